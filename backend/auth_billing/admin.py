@@ -77,3 +77,5 @@ class AuditLogAdmin(admin.ModelAdmin):
     date_hierarchy = 'timestamp'
     raw_id_fields = ['user']
     readonly_fields = ['timestamp']
+    # Skip the unfiltered COUNT(*) over the whole table on every changelist page
+    show_full_result_count = False
@@ -0,0 +1,74 @@
+"""
+JWT authentication backed by a short-lived user cache
+"""
+import copy
+import time
+from collections import OrderedDict
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+JWT_USER_CACHE_TIMEOUT = 300  # seconds
+# Per-worker copy in front of the shared cache. Other workers only see an
+# invalidation once this expires, so it is kept short.
+JWT_USER_LOCAL_TTL = 5  # seconds
+JWT_USER_LOCAL_MAX_ENTRIES = 1000
+
+_local_users = OrderedDict()
+
+
+def jwt_user_cache_key(user_id):
+    return f'jwt:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    _local_users.pop(str(user_id), None)
+    cache.delete(jwt_user_cache_key(user_id))
+
+
+def _get_local_user(user_id):
+    entry = _local_users.get(user_id)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if time.monotonic() >= expires_at:
+        _local_users.pop(user_id, None)
+        return None
+    # Requests may modify request.user, so each one gets its own instance
+    return copy.copy(user)
+
+
+def _set_local_user(user_id, user):
+    _local_users[user_id] = (time.monotonic() + JWT_USER_LOCAL_TTL, user)
+    _local_users.move_to_end(user_id)
+    if len(_local_users) > JWT_USER_LOCAL_MAX_ENTRIES:
+        _local_users.popitem(last=False)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that serves the token's user from the cache instead of the database"""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        user_id = str(user_id)
+        user = _get_local_user(user_id)
+        if user is not None:
+            return user
+
+        key = jwt_user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            # Never keep the user past the token's own expiry
+            timeout = min(int(validated_token['exp'] - time.time()), JWT_USER_CACHE_TIMEOUT)
+            if timeout > 0:
+                cache.set(key, user, timeout)
+        elif not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        _set_local_user(user_id, copy.copy(user))
+        return user
@@ -0,0 +1,42 @@
+"""
+Failed login tracking
+
+Each failed login bumps a counter per email and per client IP. Once
+either reaches its limit, further attempts are rejected before the
+password is hashed, so credential-stuffing bursts cost a cache lookup
+instead of a bcrypt round and a user query.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _email_key(email):
+    return f'login:fail:email:{email.strip().lower()}'
+
+
+def _ip_key(ip):
+    return f'login:fail:ip:{ip}'
+
+
+def login_blocked(email, ip):
+    """True if the email or IP has too many recent failed logins"""
+    counts = cache.get_many([_email_key(email), _ip_key(ip)])
+    return (
+        counts.get(_email_key(email), 0) >= settings.LOGIN_FAILURE_LIMIT
+        or counts.get(_ip_key(ip), 0) >= settings.LOGIN_FAILURE_IP_LIMIT
+    )
+
+
+def record_login_failure(email, ip):
+    for key in (_email_key(email), _ip_key(ip)):
+        # add() opens the window with its TTL; incr() keeps that TTL
+        cache.add(key, 0, settings.LOGIN_FAILURE_WINDOW)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(key, 1, settings.LOGIN_FAILURE_WINDOW)
+
+
+def clear_login_failures(email):
+    cache.delete(_email_key(email))
@@ -1,10 +1,46 @@
 """
 Custom middleware for rate limiting and other features
 """
-from django.core.cache import cache
+import socket
+import time
+from collections import OrderedDict
 from django.http import JsonResponse
 from django.conf import settings
-from .utils import get_client_ip
+from django_redis import get_redis_connection
+from .utils import end_audit_buffer, get_client_ip, start_audit_buffer
+
+
+# Open each window with SET NX EX (so a counter never exists without a TTL),
+# then add ARGV[1] requests to both, atomically on the Redis server.
+# Returns {minute_count, hour_count, minute_pttl, hour_pttl}.
+RATE_LIMIT_LUA = """
+redis.call('SET', KEYS[1], 0, 'EX', 60, 'NX')
+redis.call('SET', KEYS[2], 0, 'EX', 3600, 'NX')
+local m = redis.call('INCRBY', KEYS[1], ARGV[1])
+local h = redis.call('INCRBY', KEYS[2], ARGV[1])
+return {m, h, redis.call('PTTL', KEYS[1]), redis.call('PTTL', KEYS[2])}
+"""
+
+
+def _pack_ip(ip):
+    """Binary form of an IP address (4 or 16 bytes), or the raw text if it does not parse"""
+    try:
+        return socket.inet_pton(socket.AF_INET6 if ':' in ip else socket.AF_INET, ip)
+    except (OSError, TypeError):
+        return str(ip).encode()
+
+
+class _LocalWindow:
+    """Per-worker view of an identifier's counters as of the last Redis sync"""
+    __slots__ = ('minute_count', 'minute_reset', 'hour_count', 'hour_reset', 'pending', 'synced_at')
+
+    def __init__(self):
+        self.minute_count = 0
+        self.minute_reset = 0.0
+        self.hour_count = 0
+        self.hour_reset = 0.0
+        self.pending = 0
+        self.synced_at = 0.0
 
 
 class RateLimitMiddleware:
@@ -12,6 +48,47 @@ class RateLimitMiddleware:
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self._script = None
+        # L1 cache in front of Redis: identifiers already over their limit are
+        # rejected without a round-trip, and allowed requests are counted
+        # locally and flushed to Redis in batches.
+        self._local = OrderedDict()
+        self._local_max_entries = settings.RATE_LIMIT_LOCAL_MAX_ENTRIES
+        self._local_batch = settings.RATE_LIMIT_LOCAL_BATCH
+        self._local_flush_interval = settings.RATE_LIMIT_LOCAL_FLUSH_INTERVAL
+
+    def _get_script(self):
+        # Registered lazily so Redis is not required at import time; the
+        # Script object runs EVALSHA and reloads the script on NOSCRIPT.
+        if self._script is None:
+            self._script = get_redis_connection('default').register_script(RATE_LIMIT_LUA)
+        return self._script
+
+    def _get_window(self, identifier):
+        window = self._local.get(identifier)
+        if window is None:
+            window = self._local[identifier] = _LocalWindow()
+            if len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+        else:
+            self._local.move_to_end(identifier)
+        return window
+
+    def _sync(self, window, identifier, now):
+        """Flush pending requests plus the current one to Redis"""
+        minute_count, hour_count, minute_pttl, hour_pttl = self._get_script()(
+            keys=[b'rate_limit:m:' + identifier, b'rate_limit:h:' + identifier],
+            args=[window.pending + 1]
+        )
+        window.minute_count = minute_count
+        window.minute_reset = now + max(minute_pttl, 0) / 1000
+        window.hour_count = hour_count
+        window.hour_reset = now + max(hour_pttl, 0) / 1000
+        window.pending = 0
+        window.synced_at = now
+
+    def _rate_limited(self, message):
+        return JsonResponse({'error': message}, status=429)
 
     def __call__(self, request):
         # Skip rate limiting for admin
@@ -20,40 +97,49 @@ class RateLimitMiddleware:
 
         # Get client identifier (IP or user ID)
         if request.user.is_authenticated:
-            identifier = f"user:{request.user.id}"
+            identifier = b'u' + request.user.id.bytes
         else:
-            identifier = f"ip:{get_client_ip(request)}"
-
-        # Check rate limits
-        minute_key = f"rate_limit:minute:{identifier}"
-        hour_key = f"rate_limit:hour:{identifier}"
-
-        minute_count = cache.get(minute_key, 0)
-        hour_count = cache.get(hour_key, 0)
-
-        # Check if limits exceeded
-        if minute_count >= settings.RATE_LIMIT_PER_MINUTE:
-            return JsonResponse(
-                {'error': 'Rate limit exceeded. Please try again later.'},
-                status=429
-            )
-
-        if hour_count >= settings.RATE_LIMIT_PER_HOUR:
-            return JsonResponse(
-                {'error': 'Hourly rate limit exceeded. Please try again later.'},
-                status=429
-            )
-
-        # Increment counters
-        if minute_count == 0:
-            cache.set(minute_key, 1, 60)  # 1 minute TTL
-        else:
-            cache.incr(minute_key)
+            identifier = b'i' + _pack_ip(get_client_ip(request))
+
+        now = time.monotonic()
+        window = self._get_window(identifier)
+        in_window = now < window.minute_reset and now < window.hour_reset
 
-        if hour_count == 0:
-            cache.set(hour_key, 1, 3600)  # 1 hour TTL
+        # Already over the limit in the current window: reject locally
+        if in_window and window.minute_count >= settings.RATE_LIMIT_PER_MINUTE:
+            return self._rate_limited('Rate limit exceeded. Please try again later.')
+        if in_window and window.hour_count >= settings.RATE_LIMIT_PER_HOUR:
+            return self._rate_limited('Hourly rate limit exceeded. Please try again later.')
+
+        if (in_window and window.pending + 1 < self._local_batch
+                and now - window.synced_at < self._local_flush_interval):
+            # Count locally; the batch goes to Redis with the next sync
+            window.pending += 1
+            window.minute_count += 1
+            window.hour_count += 1
         else:
-            cache.incr(hour_key)
+            self._sync(window, identifier, now)
+
+            # Check if limits exceeded
+            if window.minute_count > settings.RATE_LIMIT_PER_MINUTE:
+                return self._rate_limited('Rate limit exceeded. Please try again later.')
+
+            if window.hour_count > settings.RATE_LIMIT_PER_HOUR:
+                return self._rate_limited('Hourly rate limit exceeded. Please try again later.')
 
         response = self.get_response(request)
         return response
+
+
+class AuditLogFlushMiddleware:
+    """Buffer the audit entries created while handling a request and queue them once"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = start_audit_buffer()
+        try:
+            return self.get_response(request)
+        finally:
+            end_audit_buffer(token)
@@ -0,0 +1,44 @@
+import auth_billing.models
+from django.db import migrations, models
+
+
+# Timestamps are rendered in UTC to match the numbers previously generated
+# in Python from timezone.now().
+CREATE_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION gen_order_number() RETURNS varchar AS $$
+    SELECT to_char(clock_timestamp() AT TIME ZONE 'UTC', 'YYMMDDHH24MISS')
+        || upper(substr(md5(random()::text), 1, 6))
+$$ LANGUAGE sql VOLATILE;
+
+CREATE OR REPLACE FUNCTION gen_invoice_number() RETURNS varchar AS $$
+    SELECT 'INV'
+        || to_char(clock_timestamp() AT TIME ZONE 'UTC', 'YYMMDDHH24MISS')
+        || upper(substr(md5(random()::text), 1, 5))
+$$ LANGUAGE sql VOLATILE;
+"""
+
+DROP_FUNCTIONS_SQL = """
+DROP FUNCTION IF EXISTS gen_order_number();
+DROP FUNCTION IF EXISTS gen_invoice_number();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_billing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_FUNCTIONS_SQL, DROP_FUNCTIONS_SQL),
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(db_default=auth_billing.models.GenerateOrderNumber(), editable=False, max_length=50, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='invoice_number',
+            field=models.CharField(db_default=auth_billing.models.GenerateInvoiceNumber(), editable=False, max_length=50, unique=True),
+        ),
+    ]
@@ -0,0 +1,115 @@
+"""
+Switch Subscription, Order, Invoice and AuditLog to bigint primary keys.
+
+The existing UUID column is kept (renamed to external_id) so API
+identifiers do not change. Foreign keys pointing at these tables
+(Order.subscription, Invoice.order) are parked in temporary UUID columns
+while the primary keys are swapped, then rebuilt against the new ids.
+"""
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+def swap_primary_key_sql(table):
+    return f"""
+        ALTER TABLE {table} RENAME COLUMN id TO external_id;
+        ALTER TABLE {table} DROP CONSTRAINT {table}_pkey;
+        ALTER TABLE {table} ADD CONSTRAINT {table}_external_id_key UNIQUE (external_id);
+        ALTER TABLE {table} ADD COLUMN id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY;
+    """
+
+
+def swap_primary_key(model_name, table):
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[migrations.RunSQL(swap_primary_key_sql(table))],
+        state_operations=[
+            migrations.AddField(
+                model_name=model_name,
+                name='external_id',
+                field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+            ),
+            migrations.AlterField(
+                model_name=model_name,
+                name='id',
+                field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+            ),
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_billing', '0002_db_generated_numbers'),
+    ]
+
+    operations = [
+        # Park the foreign keys that reference the UUID primary keys
+        migrations.AddField(
+            model_name='order',
+            name='subscription_uuid',
+            field=models.UUIDField(null=True),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='order_uuid',
+            field=models.UUIDField(null=True),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE orders SET subscription_uuid = subscription_id;
+            UPDATE invoices SET order_uuid = order_id;
+            """
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='subscription',
+        ),
+        migrations.RemoveField(
+            model_name='invoice',
+            name='order',
+        ),
+
+        # Swap the primary keys
+        swap_primary_key('subscription', 'subscriptions'),
+        swap_primary_key('order', 'orders'),
+        swap_primary_key('invoice', 'invoices'),
+        swap_primary_key('auditlog', 'audit_logs'),
+
+        # Rebuild the foreign keys against the new ids
+        migrations.AddField(
+            model_name='order',
+            name='subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='auth_billing.subscription'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='order',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='invoice', to='auth_billing.order'),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE orders SET subscription_id = subscriptions.id
+            FROM subscriptions WHERE orders.subscription_uuid = subscriptions.external_id;
+            UPDATE invoices SET order_id = orders.id
+            FROM orders WHERE invoices.order_uuid = orders.external_id;
+            -- Run the deferred FK checks now so the following ALTER TABLEs
+            -- do not fail with pending trigger events
+            SET CONSTRAINTS ALL IMMEDIATE;
+            """
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='order',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='invoice', to='auth_billing.order'),
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='subscription_uuid',
+        ),
+        migrations.RemoveField(
+            model_name='invoice',
+            name='order_uuid',
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_billing', '0003_bigint_primary_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='subscription',
+            name='subscriptio_status_fc7385_idx',
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['end_date'], name='sub_active_exp_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_payment_d62da9_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('payment_id', ''), _negated=True), fields=['payment_id'], name='orders_payment_id_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+# gen_random_uuid() (core since PostgreSQL 13) draws from the server's
+# strong random source, so the suffix no longer goes through random() and
+# an md5() call. Its first 6 hex digits are fully random (the version
+# nibble comes later).
+CREATE_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION gen_order_number() RETURNS varchar AS $$
+    SELECT to_char(clock_timestamp() AT TIME ZONE 'UTC', 'YYMMDDHH24MISS')
+        || upper(substr(gen_random_uuid()::text, 1, 6))
+$$ LANGUAGE sql VOLATILE;
+
+CREATE OR REPLACE FUNCTION gen_invoice_number() RETURNS varchar AS $$
+    SELECT 'INV'
+        || to_char(clock_timestamp() AT TIME ZONE 'UTC', 'YYMMDDHH24MISS')
+        || upper(substr(gen_random_uuid()::text, 1, 5))
+$$ LANGUAGE sql VOLATILE;
+"""
+
+PREVIOUS_FUNCTIONS_SQL = """
+CREATE OR REPLACE FUNCTION gen_order_number() RETURNS varchar AS $$
+    SELECT to_char(clock_timestamp() AT TIME ZONE 'UTC', 'YYMMDDHH24MISS')
+        || upper(substr(md5(random()::text), 1, 6))
+$$ LANGUAGE sql VOLATILE;
+
+CREATE OR REPLACE FUNCTION gen_invoice_number() RETURNS varchar AS $$
+    SELECT 'INV'
+        || to_char(clock_timestamp() AT TIME ZONE 'UTC', 'YYMMDDHH24MISS')
+        || upper(substr(md5(random()::text), 1, 5))
+$$ LANGUAGE sql VOLATILE;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_billing', '0004_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_FUNCTIONS_SQL, PREVIOUS_FUNCTIONS_SQL),
+    ]
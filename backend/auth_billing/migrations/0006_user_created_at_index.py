@@ -0,0 +1,22 @@
+"""
+Built concurrently so sign-ups and logins can keep writing users during
+the build.
+"""
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('auth_billing', '0005_csprng_number_suffix'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['-created_at', '-id'], name='users_created_at_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+"""
+audit_logs takes a write on every request, so the index is built
+concurrently instead of locking the table for the whole build.
+"""
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('auth_billing', '0006_user_created_at_index'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='audit_ts_id_idx'),
+        ),
+    ]
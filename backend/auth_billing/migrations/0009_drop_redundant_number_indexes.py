@@ -0,0 +1,26 @@
+"""
+order_number and invoice_number are unique, so Postgres already indexes
+them; the extra plain indexes only cost writes.
+"""
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('auth_billing', '0008_order_user_created_index'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='order',
+            name='orders_order_n_1336be_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='invoice',
+            name='invoices_invoice_7778bc_idx',
+        ),
+    ]
@@ -2,12 +2,37 @@
 Database models for Auth & Billing
 """
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Now
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 import uuid
 
 
+class GenerateOrderNumber(models.Func):
+    """
+    gen_order_number() SQL function (installed by migration 0002)
+
+    Format: YYMMDDHHmmss + 6-char random = 18 chars (ECPay limit: 20)
+    """
+    function = 'gen_order_number'
+    output_field = models.CharField()
+    allowed_default = True
+
+
+class GenerateInvoiceNumber(models.Func):
+    """
+    gen_invoice_number() SQL function (installed by migration 0002)
+
+    Format: INV + YYMMDDHHmmss + 5-char random = 20 chars
+    """
+    function = 'gen_invoice_number'
+    output_field = models.CharField()
+    allowed_default = True
+
+
 class User(AbstractUser):
     """Custom User model extending Django's AbstractUser"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -26,6 +51,10 @@ class User(AbstractUser):
         verbose_name = _('User')
         verbose_name_plural = _('Users')
         ordering = ['-created_at']
+        indexes = [
+            # Matches the list's (-created_at, -id) cursor ordering
+            models.Index(fields=['-created_at', '-id'], name='users_created_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.email} ({self.username})"
@@ -72,6 +101,12 @@ class Plan(models.Model):
         return f"{self.name} - {self.get_billing_cycle_display()}"
 
 
+class SubscriptionQuerySet(models.QuerySet):
+    def active(self):
+        """Subscriptions that are currently active (SQL version of Subscription.is_active)"""
+        return self.filter(status='active', start_date__lte=Now(), end_date__gte=Now())
+
+
 class Subscription(models.Model):
     """User Subscriptions"""
     STATUS_CHOICES = [
@@ -82,7 +117,9 @@ class Subscription(models.Model):
         ('trial', _('Trial')),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Primary key is the default BigAutoField, which keeps inserts sequential
+    # and the index compact; the UUID is what the API exposes
+    external_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -106,6 +143,8 @@ class Subscription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SubscriptionQuerySet.as_manager()
+
     class Meta:
         db_table = 'subscriptions'
         verbose_name = _('Subscription')
@@ -113,7 +152,8 @@ class Subscription(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'status']),
-            models.Index(fields=['status', 'end_date']),
+            # Expiry sweep only ever scans active subscriptions
+            models.Index(fields=['end_date'], name='sub_active_exp_idx', condition=Q(status='active')),
         ]
 
     def __str__(self):
@@ -122,7 +162,6 @@ class Subscription(models.Model):
     @property
     def is_active(self):
         """Check if subscription is currently active"""
-        from django.utils import timezone
         return (
             self.status == 'active' and
             self.start_date <= timezone.now() <= self.end_date
@@ -147,8 +186,14 @@ class Order(models.Model):
         ('barcode', _('Barcode')),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    order_number = models.CharField(max_length=50, unique=True, editable=False)
+    external_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    # Generated by the database on insert, so bulk_create() works too
+    order_number = models.CharField(
+        max_length=50,
+        unique=True,
+        editable=False,
+        db_default=GenerateOrderNumber()
+    )
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -199,31 +244,24 @@ class Order(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'status']),
-            models.Index(fields=['order_number']),
-            models.Index(fields=['payment_id']),
+            # Per-user order list, paged by the (-created_at, -id) cursor
+            models.Index(fields=['user', '-created_at', '-id'], name='orders_user_created_idx'),
+            models.Index(fields=['payment_id'], name='orders_payment_id_idx', condition=~Q(payment_id='')),
         ]
 
     def __str__(self):
         return f"Order {self.order_number} - {self.user.email}"
 
-    def save(self, *args, **kwargs):
-        if not self.order_number:
-            # Generate order number (ECPay limit: 20 characters)
-            # Format: YYMMDDHHmmss + 6-char random = 16 chars total
-            from django.utils import timezone
-            import random
-            import string
-
-            timestamp = timezone.now().strftime('%y%m%d%H%M%S')  # 12 chars: YYMMDDHHmmss
-            random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))  # 6 chars
-            self.order_number = f"{timestamp}{random_suffix}"  # Total: 18 chars (safe for ECPay)
-        super().save(*args, **kwargs)
-
 
 class Invoice(models.Model):
     """Invoices for completed orders"""
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    invoice_number = models.CharField(max_length=50, unique=True, editable=False)
+    external_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    invoice_number = models.CharField(
+        max_length=50,
+        unique=True,
+        editable=False,
+        db_default=GenerateInvoiceNumber()
+    )
     order = models.OneToOneField(
         Order,
         on_delete=models.CASCADE,
@@ -264,25 +302,11 @@ class Invoice(models.Model):
         ordering = ['-issued_at']
         indexes = [
             models.Index(fields=['user', 'issued_at']),
-            models.Index(fields=['invoice_number']),
         ]
 
     def __str__(self):
         return f"Invoice {self.invoice_number} - {self.user.email}"
 
-    def save(self, *args, **kwargs):
-        if not self.invoice_number:
-            # Generate invoice number (keeping under 20 chars for consistency)
-            # Format: INV + YYMMDDHHmmss + 5-char random = 20 chars total
-            from django.utils import timezone
-            import random
-            import string
-
-            timestamp = timezone.now().strftime('%y%m%d%H%M%S')  # 12 chars
-            random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=5))  # 5 chars
-            self.invoice_number = f"INV{timestamp}{random_suffix}"  # Total: 20 chars
-        super().save(*args, **kwargs)
-
 
 class AuditLog(models.Model):
     """Audit logs for tracking user actions"""
@@ -296,7 +320,7 @@ class AuditLog(models.Model):
         ('subscription', _('Subscription')),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    external_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     user = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -306,6 +330,7 @@ class AuditLog(models.Model):
     )
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     resource_type = models.CharField(max_length=50)
+    # Text, not an integer: holds user UUIDs and the external_id of other resources
     resource_id = models.CharField(max_length=100, blank=True)
     description = models.TextField(blank=True)
     ip_address = models.GenericIPAddressField(blank=True, null=True)
@@ -322,6 +347,8 @@ class AuditLog(models.Model):
             models.Index(fields=['user', 'timestamp']),
             models.Index(fields=['action', 'timestamp']),
             models.Index(fields=['resource_type', 'resource_id']),
+            # Matches the list's (-timestamp, -id) cursor ordering
+            models.Index(fields=['-timestamp', '-id'], name='audit_ts_id_idx'),
         ]
 
     def __str__(self):
@@ -0,0 +1,23 @@
+"""
+Cursor (keyset) pagination for append-mostly tables
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """Pages with WHERE <ordering field> < cursor instead of OFFSET, so deep pages cost the same as the first"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class TimestampKeysetPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+
+
+class CreatedAtKeysetPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class IssuedAtKeysetPagination(KeysetPagination):
+    ordering = ('-issued_at', '-id')
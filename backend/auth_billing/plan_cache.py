@@ -0,0 +1,70 @@
+"""
+Cached Plan lookups
+
+Plans change rarely but are read on every checkout, so they are served
+from Redis. Misses are single-flight: one worker takes a short lock and
+loads the plan while the others wait for it to appear in the cache.
+Unknown IDs are cached briefly as a miss so they do not hit the database
+on every request.
+"""
+import time
+from django.core.cache import cache
+from .models import Plan
+
+PLAN_CACHE_TIMEOUT = 300  # seconds
+PLAN_MISS = 'missing'  # cached in place of a plan that does not exist
+PLAN_MISS_TIMEOUT = 10  # seconds
+PLAN_LOCK_TIMEOUT = 5  # seconds
+PLAN_LOCK_WAIT = 0.05  # seconds between cache polls while another worker loads
+PLAN_LOCK_WAIT_ATTEMPTS = 20
+PLAN_LIST_CACHE_TIMEOUT = 300  # seconds
+PLAN_HTTP_MAX_AGE = 60  # seconds clients may reuse a plan response
+
+
+def plan_cache_key(plan_id):
+    return f'plan:{plan_id}'
+
+
+def get_plan_cached(plan_id):
+    """Return the Plan with the given ID (None if it does not exist)"""
+    key = plan_cache_key(plan_id)
+    plan = cache.get(key)
+    if plan is not None:
+        return None if plan == PLAN_MISS else plan
+
+    lock_key = f'plan:lock:{plan_id}'
+    if cache.add(lock_key, 1, PLAN_LOCK_TIMEOUT):
+        try:
+            plan = Plan.objects.filter(id=plan_id).first()
+            if plan is not None:
+                cache.set(key, plan, PLAN_CACHE_TIMEOUT)
+            else:
+                cache.set(key, PLAN_MISS, PLAN_MISS_TIMEOUT)
+            return plan
+        finally:
+            cache.delete(lock_key)
+
+    # Another worker is loading this plan
+    for _ in range(PLAN_LOCK_WAIT_ATTEMPTS):
+        time.sleep(PLAN_LOCK_WAIT)
+        plan = cache.get(key)
+        if plan is not None:
+            return None if plan == PLAN_MISS else plan
+
+    return Plan.objects.filter(id=plan_id).first()
+
+
+def plan_list_cache_key(query_params):
+    """Cache key for one rendering of the public plan list (filters and page included)"""
+    query = '&'.join(f'{name}={value}' for name, values in sorted(query_params.lists()) for value in values)
+    return f'plan:list:{query}'
+
+
+def invalidate_plans(plan_ids):
+    """Drop the given plans and the cached plan list (one keyspace scan for all of them)"""
+    cache.delete_many([plan_cache_key(plan_id) for plan_id in plan_ids])
+    cache.delete_pattern('plan:list:*')
+
+
+def invalidate_plan(plan_id):
+    invalidate_plans([plan_id])
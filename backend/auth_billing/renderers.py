@@ -0,0 +1,31 @@
+"""
+DRF renderers
+"""
+from decimal import Decimal
+import orjson
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+
+def _default(obj):
+    """Types orjson does not handle natively"""
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSON renderer using orjson"""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+    options = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_default, option=self.options)
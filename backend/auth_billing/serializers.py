@@ -4,7 +4,9 @@ DRF Serializers for API
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import authenticate
+from drf_spectacular.utils import extend_schema_field
 from .models import User, Plan, Subscription, Order, Invoice, AuditLog
+from .plan_cache import get_plan_cached
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -18,6 +20,25 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'is_verified', 'created_at', 'updated_at']
 
 
+class NestedUserSerializer(serializers.ModelSerializer):
+    """Minimal user representation embedded in other resources"""
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'email']
+        read_only_fields = fields
+
+
+@extend_schema_field(NestedUserSerializer)
+class NestedUserField(serializers.Field):
+    """Renders NestedUserSerializer's output directly, skipping per-row Field dispatch"""
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, user):
+        return {'id': str(user.id), 'username': user.username, 'email': user.email}
+
+
 class UserCreateSerializer(serializers.ModelSerializer):
     """Serializer for user registration"""
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -40,6 +61,10 @@ class UserCreateSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
+    def to_representation(self, instance):
+        # Respond with the public user shape rather than the write fields
+        return UserSerializer(instance, context=self.context).data
+
 
 class UserUpdateSerializer(serializers.ModelSerializer):
     """Serializer for user update"""
@@ -47,6 +72,13 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         model = User
         fields = ['username', 'first_name', 'last_name', 'phone', 'avatar']
 
+    def update(self, instance, validated_data):
+        # Write only the submitted columns (PATCH usually sends one or two)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
 
 class PasswordChangeSerializer(serializers.Serializer):
     """Serializer for password change"""
@@ -102,7 +134,8 @@ class PlanSerializer(serializers.ModelSerializer):
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     """Serializer for Subscription model"""
-    user = UserSerializer(read_only=True)
+    id = serializers.UUIDField(source='external_id', read_only=True)
+    user = NestedUserField()
     plan = PlanSerializer(read_only=True)
     plan_id = serializers.UUIDField(write_only=True)
 
@@ -124,10 +157,14 @@ class SubscriptionCreateSerializer(serializers.ModelSerializer):
         model = Subscription
         fields = ['plan_id', 'auto_renew']
 
-    def validate_plan_id(self, value):
-        if not Plan.objects.filter(id=value, is_active=True).exists():
-            raise serializers.ValidationError("Invalid or inactive plan.")
-        return value
+    def validate(self, attrs):
+        # Resolve the plan once here and hand it to the view, which needs
+        # its billing cycle, instead of checking the active ID set first
+        plan = get_plan_cached(attrs.pop('plan_id'))
+        if plan is None or not plan.is_active:
+            raise serializers.ValidationError({'plan_id': "Invalid or inactive plan."})
+        attrs['plan'] = plan
+        return attrs
 
 
 class SubscriptionStatusSerializer(serializers.Serializer):
@@ -138,7 +175,8 @@ class SubscriptionStatusSerializer(serializers.Serializer):
 
 class OrderSerializer(serializers.ModelSerializer):
     """Serializer for Order model"""
-    user = UserSerializer(read_only=True)
+    id = serializers.UUIDField(source='external_id', read_only=True)
+    user = NestedUserField()
     plan = PlanSerializer(read_only=True)
 
     class Meta:
@@ -153,26 +191,32 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
 
 
-class OrderCreateSerializer(serializers.ModelSerializer):
-    """Serializer for creating order"""
-    plan_id = serializers.UUIDField(required=True)
+class OrderCreateSerializer(OrderSerializer):
+    """Serializer for creating order; responds with the full OrderSerializer shape"""
+    plan_id = serializers.UUIDField(required=True, write_only=True)
     payment_method = serializers.ChoiceField(choices=Order.PAYMENT_METHOD_CHOICES)
 
-    class Meta:
-        model = Order
-        fields = ['plan_id', 'payment_method', 'notes']
+    class Meta(OrderSerializer.Meta):
+        fields = [*OrderSerializer.Meta.fields, 'plan_id']
+        # Only the plan, payment method and notes come from the client
+        read_only_fields = [
+            field for field in OrderSerializer.Meta.fields
+            if field not in ('payment_method', 'notes')
+        ]
 
-    def validate_plan_id(self, value):
-        if not Plan.objects.filter(id=value, is_active=True).exists():
-            raise serializers.ValidationError("Invalid or inactive plan.")
-        return value
+    def validate(self, attrs):
+        # Resolve the plan once; a second lookup in create() could come back
+        # None if the plan was deactivated in between
+        plan = get_plan_cached(attrs.pop('plan_id'))
+        if plan is None or not plan.is_active:
+            raise serializers.ValidationError({'plan_id': "Invalid or inactive plan."})
+        attrs['plan'] = plan
+        return attrs
 
     def create(self, validated_data):
-        plan_id = validated_data.pop('plan_id')
-        plan = Plan.objects.get(id=plan_id)
+        plan = validated_data['plan']
         order = Order.objects.create(
             user=self.context['request'].user,
-            plan=plan,
             amount=plan.price,
             **validated_data
         )
@@ -181,7 +225,8 @@ class OrderCreateSerializer(serializers.ModelSerializer):
 
 class InvoiceSerializer(serializers.ModelSerializer):
     """Serializer for Invoice model"""
-    user = UserSerializer(read_only=True)
+    id = serializers.UUIDField(source='external_id', read_only=True)
+    user = NestedUserField()
     order = OrderSerializer(read_only=True)
 
     class Meta:
@@ -196,7 +241,8 @@ class InvoiceSerializer(serializers.ModelSerializer):
 
 class AuditLogSerializer(serializers.ModelSerializer):
     """Serializer for AuditLog model"""
-    user = UserSerializer(read_only=True)
+    id = serializers.UUIDField(source='external_id', read_only=True)
+    user = NestedUserField()
 
     class Meta:
         model = AuditLog
@@ -205,3 +251,41 @@ class AuditLogSerializer(serializers.ModelSerializer):
             'description', 'ip_address', 'user_agent', 'metadata', 'timestamp'
         ]
         read_only_fields = ['id', 'timestamp']
+
+
+# Formats timestamps for AuditLogListSerializer; kept off the class so it is
+# not picked up as a declared field
+_timestamp_field = serializers.DateTimeField()
+
+
+class AuditLogListSerializer(serializers.ModelSerializer):
+    """Summary of an AuditLog for list views"""
+    id = serializers.UUIDField(source='external_id', read_only=True)
+    user = NestedUserField()
+
+    class Meta:
+        model = AuditLog
+        fields = ['id', 'user', 'action', 'resource_type', 'resource_id', 'timestamp']
+        read_only_fields = fields
+
+    # Columns AuditLogViewSet's list fetches with values(); id is the cursor tiebreak
+    row_values = [
+        'id', 'external_id', 'action', 'resource_type', 'resource_id', 'timestamp',
+        'user_id', 'user__username', 'user__email',
+    ]
+
+    def to_representation(self, row):
+        # Lists can be thousands of rows, so each row arrives as a values()
+        # dict and is built directly; the declared fields above still
+        # describe the output for the schema
+        user_id = row['user_id']
+        return {
+            'id': str(row['external_id']),
+            'user': {
+                'id': str(user_id), 'username': row['user__username'], 'email': row['user__email'],
+            } if user_id else None,
+            'action': row['action'],
+            'resource_type': row['resource_type'],
+            'resource_id': row['resource_id'],
+            'timestamp': _timestamp_field.to_representation(row['timestamp']),
+        }
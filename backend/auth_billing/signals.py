@@ -1,39 +1,55 @@
 """
 Django signals for automatic actions
 """
-from django.db.models.signals import post_save
+from decimal import Decimal
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import Order, Invoice, Subscription
+from .authentication import invalidate_cached_user
+from .models import User, Order, Invoice, Subscription, Plan
+from .plan_cache import invalidate_plan
+
+# 5% Taiwan business tax
+_TAX_RATE = Decimal('0.05')
 
 
 @receiver(post_save, sender=Order)
-def create_invoice_on_order_completion(sender, instance, created, **kwargs):
-    """Automatically create invoice when order is completed"""
-    if instance.status == 'completed' and instance.paid_at:
-        # Check if invoice already exists
-        if not hasattr(instance, 'invoice'):
-            # Calculate tax (5% Taiwan business tax)
-            from decimal import Decimal
-            tax_amount = instance.amount * Decimal('0.05')
-            total_amount = instance.amount + tax_amount
-
-            Invoice.objects.create(
-                order=instance,
-                user=instance.user,
-                amount=instance.amount,
-                tax_amount=tax_amount,
-                total_amount=total_amount,
-                currency=instance.currency,
-                paid_at=instance.paid_at
-            )
+def handle_completed_order(sender, instance, created, **kwargs):
+    """Create the invoice and activate the subscription when an order is completed"""
+    if instance.status != 'completed' or not instance.paid_at:
+        return
 
+    # Automatically create invoice; the OneToOne uniqueness makes this idempotent
+    tax_amount = instance.amount * _TAX_RATE
+    Invoice.objects.get_or_create(
+        order=instance,
+        defaults={
+            'user_id': instance.user_id,
+            'amount': instance.amount,
+            'tax_amount': tax_amount,
+            'total_amount': instance.amount + tax_amount,
+            'currency': instance.currency,
+            'paid_at': instance.paid_at,
+        }
+    )
 
-@receiver(post_save, sender=Order)
-def activate_subscription_on_payment(sender, instance, created, **kwargs):
-    """Activate subscription when order is completed"""
-    if instance.status == 'completed' and instance.paid_at and instance.subscription:
+    # Activate subscription when order is completed
+    if instance.subscription_id:
         subscription = instance.subscription
         if subscription.status == 'pending':
             subscription.status = 'active'
-            subscription.save()
+            subscription.save(update_fields=['status', 'updated_at'])
+
+
+@receiver(post_save, sender=Plan)
+@receiver(post_delete, sender=Plan)
+def invalidate_plan_cache(sender, instance, **kwargs):
+    """Drop the cached copy of a plan when it changes"""
+    invalidate_plan(instance.id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Drop the cached user used by JWT authentication when it changes"""
+    invalidate_cached_user(instance.pk)
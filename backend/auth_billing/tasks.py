@@ -3,31 +3,104 @@ Celery tasks for async processing
 """
 from celery import shared_task
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.core import mail
 from django.conf import settings
-from .models import Subscription, Order
+from django.db import InterfaceError, OperationalError, connection, transaction
+from django_redis import get_redis_connection
+from .models import AuditLog, Subscription, Order
+from .utils import AUDIT_LOG_DEAD_LETTER_KEY, AUDIT_LOG_EARLY_FLUSH_SIZE, AUDIT_LOG_QUEUE_KEY
+from smtplib import SMTPServerDisconnected
+from string import Template
+from datetime import timedelta
+import csv
+import io
+import json
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+EXPIRATION_EMAIL_BATCH_SIZE = 100
+
+EXPIRATION_EMAIL_TEMPLATE = Template(
+    'Dear $username,\n\n'
+    'Your subscription to $plan_name has expired.\n'
+    'Please renew your subscription to continue using our services.'
+)
+PAYMENT_CONFIRMATION_EMAIL_TEMPLATE = Template(
+    'Dear $username,\n\n'
+    'Your payment of $$$amount has been received successfully.\n'
+    'Order Number: $order_number\n\n'
+    'Thank you for your purchase!'
+)
+
+AUDIT_LOG_FLUSH_BATCH_SIZE = AUDIT_LOG_EARLY_FLUSH_SIZE
+# Batches up to this size use one INSERT; bigger ones go through COPY
+AUDIT_LOG_COPY_THRESHOLD = 100
+AUDIT_LOG_COLUMNS = (
+    'external_id', 'user_id', 'action', 'resource_type', 'resource_id',
+    'description', 'ip_address', 'user_agent', 'metadata', 'timestamp',
+)
+AUDIT_LOG_PURGE_BATCH_SIZE = 5000
+AUDIT_LOG_ROW_PLACEHOLDER = '(%s::uuid, %s::uuid, %s, %s, %s, %s, %s::inet, %s, %s::jsonb, %s::timestamptz)'
+
+# One open mail connection per worker thread, reused across tasks
+_mail_local = threading.local()
+
+
+def _get_mail_connection():
+    mail_connection = getattr(_mail_local, 'connection', None)
+    if mail_connection is None:
+        mail_connection = mail.get_connection(fail_silently=False)
+        mail_connection.open()
+        _mail_local.connection = mail_connection
+    return mail_connection
+
+
+def _reset_mail_connection():
+    mail_connection = getattr(_mail_local, 'connection', None)
+    _mail_local.connection = None
+    if mail_connection is not None:
+        try:
+            mail_connection.close()
+        except Exception:
+            pass
+
+
+def _send_messages(messages):
+    """Send messages over the worker's persistent connection"""
+    try:
+        return _get_mail_connection().send_messages(messages) or 0
+    except SMTPServerDisconnected:
+        # The server dropped the idle connection; reconnect once
+        _reset_mail_connection()
+        return _get_mail_connection().send_messages(messages) or 0
+    except Exception:
+        _reset_mail_connection()
+        raise
+
 
 @shared_task
 def check_expired_subscriptions():
     """Check and update expired subscriptions"""
     now = timezone.now()
-    expired_subscriptions = Subscription.objects.filter(
+    expired_ids = list(Subscription.objects.filter(
         status='active',
         end_date__lt=now
-    )
+    ).values_list('id', flat=True))
+    if not expired_ids:
+        logger.info("Updated 0 expired subscriptions")
+        return 0
 
-    count = 0
-    for subscription in expired_subscriptions:
-        subscription.status = 'expired'
-        subscription.save()
-        count += 1
+    # Expire them all in a single UPDATE
+    count = Subscription.objects.filter(id__in=expired_ids, status='active').update(
+        status='expired',
+        updated_at=now
+    )
 
-        # Send expiration notification
-        send_subscription_expiration_email.delay(subscription.id)
+    # Send expiration notifications, 100 per task
+    for start in range(0, len(expired_ids), EXPIRATION_EMAIL_BATCH_SIZE):
+        send_expiration_emails_bulk.delay(expired_ids[start:start + EXPIRATION_EMAIL_BATCH_SIZE])
 
     logger.info(f"Updated {count} expired subscriptions")
     return count
@@ -36,37 +109,55 @@ def check_expired_subscriptions():
 @shared_task
 def send_subscription_expiration_email(subscription_id):
     """Send email notification for subscription expiration"""
+    return send_expiration_emails_bulk([subscription_id])
+
+
+@shared_task
+def send_expiration_emails_bulk(subscription_ids):
+    """Send expiration notifications for many subscriptions in one batch"""
     try:
-        subscription = Subscription.objects.get(id=subscription_id)
-        send_mail(
-            subject='Your subscription has expired',
-            message=f'Dear {subscription.user.username},\n\n'
-                    f'Your subscription to {subscription.plan.name} has expired.\n'
-                    f'Please renew your subscription to continue using our services.',
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[subscription.user.email],
-            fail_silently=False,
-        )
-        logger.info(f"Sent expiration email to {subscription.user.email}")
+        subscriptions = Subscription.objects.filter(id__in=subscription_ids).select_related(
+            'user', 'plan'
+        ).only('user__email', 'user__username', 'plan__name')
+
+        messages = [
+            mail.EmailMessage(
+                subject='Your subscription has expired',
+                body=EXPIRATION_EMAIL_TEMPLATE.substitute(
+                    username=subscription.user.username,
+                    plan_name=subscription.plan.name,
+                ),
+                from_email=settings.EMAIL_HOST_USER,
+                to=[subscription.user.email],
+            )
+            for subscription in subscriptions
+        ]
+        sent = _send_messages(messages)
+
+        logger.info(f"Sent {sent} expiration emails")
+        return sent
     except Exception as e:
-        logger.error(f"Failed to send expiration email: {str(e)}")
+        logger.error(f"Failed to send expiration emails: {str(e)}")
+        return 0
 
 
 @shared_task
 def send_payment_confirmation_email(order_id):
     """Send email confirmation for successful payment"""
     try:
-        order = Order.objects.get(id=order_id)
-        send_mail(
-            subject='Payment Confirmation',
-            message=f'Dear {order.user.username},\n\n'
-                    f'Your payment of ${order.amount} has been received successfully.\n'
-                    f'Order Number: {order.order_number}\n\n'
-                    f'Thank you for your purchase!',
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[order.user.email],
-            fail_silently=False,
-        )
+        order = Order.objects.select_related('user').get(id=order_id)
+        _send_messages([
+            mail.EmailMessage(
+                subject='Payment Confirmation',
+                body=PAYMENT_CONFIRMATION_EMAIL_TEMPLATE.substitute(
+                    username=order.user.username,
+                    amount=order.amount,
+                    order_number=order.order_number,
+                ),
+                from_email=settings.EMAIL_HOST_USER,
+                to=[order.user.email],
+            )
+        ])
         logger.info(f"Sent payment confirmation to {order.user.email}")
     except Exception as e:
         logger.error(f"Failed to send payment confirmation: {str(e)}")
@@ -76,17 +167,167 @@ def send_payment_confirmation_email(order_id):
 def process_payment_callback(order_id, payment_data):
     """Process payment callback from payment service"""
     try:
-        order = Order.objects.get(id=order_id)
-        order.status = 'completed'
-        order.payment_data = payment_data
-        order.paid_at = timezone.now()
-        order.save()
+        # Lock the row so concurrent deliveries of the same callback are serialised
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(id=order_id)
+            if order.status == 'completed':
+                # Duplicate delivery; already processed
+                return True
 
-        # Send confirmation email
-        send_payment_confirmation_email.delay(str(order_id))
+            order.status = 'completed'
+            order.payment_data = payment_data
+            order.paid_at = timezone.now()
+            order.save(update_fields=['status', 'payment_data', 'paid_at', 'updated_at'])
 
-        logger.info(f"Processed payment for order {order.order_number}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to process payment callback: {str(e)}")
+            # Send confirmation email once the update is committed
+            transaction.on_commit(lambda: send_payment_confirmation_email.delay(order_id))
+    except Order.DoesNotExist:
+        logger.error(f"Failed to process payment callback: order {order_id} not found")
         return False
+
+    logger.info(f"Processed payment for order {order.order_number}")
+    return True
+
+
+def _insert_audit_logs(entries):
+    """Write a small batch of decoded audit log entries with a single INSERT"""
+    params = []
+    for entry in entries:
+        entry['metadata'] = json.dumps(entry['metadata'])
+        params.extend(entry[column] for column in AUDIT_LOG_COLUMNS)
+
+    columns = ', '.join(AUDIT_LOG_COLUMNS)
+    rows = ', '.join([AUDIT_LOG_ROW_PLACEHOLDER] * len(entries))
+    with connection.cursor() as cursor:
+        # Same user_id handling as _copy_audit_logs, without a temp table
+        cursor.execute(
+            f"INSERT INTO audit_logs ({columns}) "
+            f"SELECT v.external_id, users.id, v.action, v.resource_type, v.resource_id, "
+            f"v.description, v.ip_address, v.user_agent, v.metadata, v.timestamp "
+            f"FROM (VALUES {rows}) AS v ({columns}) LEFT JOIN users ON users.id = v.user_id",
+            params
+        )
+
+
+def _copy_audit_logs(entries):
+    """Write decoded audit log entries with a single COPY"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+    for entry in entries:
+        entry['metadata'] = json.dumps(entry['metadata'])
+        writer.writerow([entry[column] for column in AUDIT_LOG_COLUMNS])
+    buffer.seek(0)
+
+    columns = ', '.join(AUDIT_LOG_COLUMNS)
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Stage into a temp table so entries for users deleted since they
+        # were queued are kept with user_id NULL instead of failing the FK
+        cursor.execute(
+            f"CREATE TEMP TABLE audit_logs_incoming ON COMMIT DROP AS "
+            f"SELECT {columns} FROM audit_logs WITH NO DATA"
+        )
+        cursor.copy_expert(
+            f"COPY audit_logs_incoming ({columns}) FROM STDIN "
+            f"WITH (FORMAT csv, FORCE_NULL (user_id, ip_address))",
+            buffer
+        )
+        cursor.execute(
+            f"INSERT INTO audit_logs ({columns}) "
+            f"SELECT i.external_id, users.id, i.action, i.resource_type, i.resource_id, "
+            f"i.description, i.ip_address, i.user_agent, i.metadata, i.timestamp "
+            f"FROM audit_logs_incoming i LEFT JOIN users ON users.id = i.user_id"
+        )
+
+
+def write_audit_logs(entries):
+    """Write decoded audit log entries, choosing INSERT or COPY by batch size"""
+    if len(entries) <= AUDIT_LOG_COPY_THRESHOLD:
+        _insert_audit_logs(entries)
+    else:
+        _copy_audit_logs(entries)
+
+
+def _write_queued_audit_logs(redis, raw_entries):
+    """
+    Write one batch of raw queued entries
+
+    A batch the database rejects because of its data is split in halves
+    until the bad entries are isolated; those are moved to the dead-letter
+    list so they cannot block the queue. If the database itself is
+    unavailable, everything not yet written goes back on the queue and the
+    error is re-raised. Returns the number of entries written.
+    """
+    written = 0
+    pending = [raw_entries]
+    while pending:
+        batch = pending.pop()
+        try:
+            write_audit_logs([json.loads(raw) for raw in batch])
+        except (OperationalError, InterfaceError):
+            # Oldest first, then pushed so the oldest end up at the right again
+            remaining = batch + [raw for chunk in reversed(pending) for raw in chunk]
+            redis.rpush(AUDIT_LOG_QUEUE_KEY, *reversed(remaining))
+            raise
+        except Exception as e:
+            if len(batch) == 1:
+                redis.lpush(AUDIT_LOG_DEAD_LETTER_KEY, batch[0])
+                logger.error(f"Moved audit log entry to {AUDIT_LOG_DEAD_LETTER_KEY}: {str(e)}")
+            else:
+                middle = len(batch) // 2
+                pending.append(batch[middle:])
+                pending.append(batch[:middle])
+        else:
+            written += len(batch)
+    return written
+
+
+@shared_task
+def flush_audit_logs():
+    """Drain queued audit log entries into the database in batches"""
+    redis = get_redis_connection('default')
+    count = 0
+
+    while True:
+        # Entries are LPUSHed, so the oldest are at the right
+        raw_entries = redis.rpop(AUDIT_LOG_QUEUE_KEY, AUDIT_LOG_FLUSH_BATCH_SIZE)
+        if not raw_entries:
+            break
+
+        try:
+            count += _write_queued_audit_logs(redis, raw_entries)
+        except Exception as e:
+            # The unwritten entries are back on the queue; retry on the next run
+            logger.error(f"Failed to flush audit logs: {str(e)}")
+            break
+
+        if len(raw_entries) < AUDIT_LOG_FLUSH_BATCH_SIZE:
+            break
+
+    if count:
+        logger.info(f"Flushed {count} audit logs")
+    return count
+
+
+@shared_task
+def purge_old_audit_logs():
+    """Delete audit logs older than AUDIT_LOG_RETENTION_DAYS, in batches"""
+    if not settings.AUDIT_LOG_RETENTION_DAYS:
+        return 0
+
+    cutoff = timezone.now() - timedelta(days=settings.AUDIT_LOG_RETENTION_DAYS)
+    expired = AuditLog.objects.filter(timestamp__lt=cutoff).order_by('timestamp', 'id')
+    count = 0
+
+    while True:
+        # Short batches keep each DELETE's locks and WAL burst small
+        ids = list(expired.values_list('id', flat=True)[:AUDIT_LOG_PURGE_BATCH_SIZE])
+        if not ids:
+            break
+        deleted, _ = AuditLog.objects.filter(id__in=ids).delete()
+        count += deleted
+        if len(ids) < AUDIT_LOG_PURGE_BATCH_SIZE:
+            break
+
+    if count:
+        logger.info(f"Purged {count} audit logs older than {cutoff.isoformat()}")
+    return count
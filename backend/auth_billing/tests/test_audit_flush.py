@@ -0,0 +1,80 @@
+"""
+Writing queued audit log batches: bisecting bad entries and requeueing on outages
+"""
+import json
+from unittest.mock import patch
+from django.db import DataError, OperationalError
+from django.test import SimpleTestCase
+from auth_billing.tasks import _write_queued_audit_logs
+from auth_billing.utils import AUDIT_LOG_DEAD_LETTER_KEY, AUDIT_LOG_QUEUE_KEY
+
+
+class FakeRedis:
+    """Lists as Python lists, left end first"""
+
+    def __init__(self):
+        self.lists = {}
+
+    def lpush(self, key, *values):
+        for value in values:
+            self.lists.setdefault(key, []).insert(0, value)
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+
+    def rpop(self, key):
+        return self.lists[key].pop()
+
+
+def raw_entries(count):
+    # Oldest first, as flush_audit_logs pops them off the right of the queue
+    return [json.dumps({'n': n}) for n in range(count)]
+
+
+class WriteQueuedAuditLogsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.written = []
+        writer = patch('auth_billing.tasks.write_audit_logs', side_effect=self.write)
+        self.addCleanup(writer.stop)
+        writer.start()
+        self.bad = set()
+        self.outage_after = None
+
+    def write(self, entries):
+        numbers = [entry['n'] for entry in entries]
+        if self.outage_after is not None and len(self.written) >= self.outage_after:
+            raise OperationalError('server closed the connection unexpectedly')
+        if self.bad.intersection(numbers):
+            raise DataError('invalid input syntax')
+        self.written.extend(numbers)
+
+    def test_bad_entry_lands_alone_in_dead_letter_list(self):
+        self.bad = {5}
+        entries = raw_entries(8)
+        self.assertEqual(_write_queued_audit_logs(self.redis, entries), 7)
+        self.assertEqual(self.redis.lists[AUDIT_LOG_DEAD_LETTER_KEY], [entries[5]])
+        self.assertEqual(self.written, [0, 1, 2, 3, 4, 6, 7])
+        self.assertNotIn(AUDIT_LOG_QUEUE_KEY, self.redis.lists)
+
+    def test_outage_requeues_whole_batch_oldest_first(self):
+        self.outage_after = 0
+        entries = raw_entries(5)
+        with self.assertRaises(OperationalError):
+            _write_queued_audit_logs(self.redis, entries)
+        requeued = [self.redis.rpop(AUDIT_LOG_QUEUE_KEY) for _ in range(5)]
+        self.assertEqual(requeued, entries)
+        self.assertNotIn(AUDIT_LOG_DEAD_LETTER_KEY, self.redis.lists)
+
+    def test_outage_while_bisecting_requeues_only_unwritten_entries(self):
+        self.bad = {1}
+        self.outage_after = 3
+        entries = raw_entries(8)
+        with self.assertRaises(OperationalError):
+            _write_queued_audit_logs(self.redis, entries)
+        # 0 and 2-3 were written and 1 dead-lettered before the outage
+        self.assertEqual(self.written, [0, 2, 3])
+        self.assertEqual(self.redis.lists[AUDIT_LOG_DEAD_LETTER_KEY], [entries[1]])
+        requeued = [self.redis.rpop(AUDIT_LOG_QUEUE_KEY) for _ in range(4)]
+        self.assertEqual(requeued, entries[4:])
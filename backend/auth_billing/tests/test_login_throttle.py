@@ -0,0 +1,89 @@
+"""
+Failed login tracking
+"""
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from auth_billing.login_throttle import clear_login_failures, login_blocked, record_login_failure
+from auth_billing.models import User
+from auth_billing.utils import get_trusted_client_ip
+
+
+@override_settings(LOGIN_FAILURE_LIMIT=3, LOGIN_FAILURE_IP_LIMIT=5, LOGIN_FAILURE_WINDOW=60)
+class LoginThrottleCounterTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.delete_many([
+            'login:fail:email:victim@example.com',
+            'login:fail:ip:10.0.0.1',
+            'login:fail:ip:10.0.0.2',
+        ])
+
+    def test_email_blocked_after_limit(self):
+        for _ in range(2):
+            record_login_failure('victim@example.com', '10.0.0.1')
+        self.assertFalse(login_blocked('victim@example.com', '10.0.0.2'))
+        record_login_failure('victim@example.com', '10.0.0.1')
+        self.assertTrue(login_blocked('victim@example.com', '10.0.0.2'))
+
+    def test_email_is_case_and_whitespace_insensitive(self):
+        for _ in range(3):
+            record_login_failure(' Victim@Example.com ', '10.0.0.1')
+        self.assertTrue(login_blocked('victim@example.com', '10.0.0.2'))
+
+    def test_ip_blocked_after_limit(self):
+        for i in range(5):
+            record_login_failure(f'user{i}@example.com', '10.0.0.1')
+        self.assertTrue(login_blocked('someone@example.com', '10.0.0.1'))
+        self.assertFalse(login_blocked('someone@example.com', '10.0.0.2'))
+
+    def test_clear_resets_email_counter(self):
+        for _ in range(3):
+            record_login_failure('victim@example.com', '10.0.0.1')
+        clear_login_failures('victim@example.com')
+        self.assertFalse(login_blocked('victim@example.com', '10.0.0.2'))
+
+
+class TrustedClientIpTests(SimpleTestCase):
+
+    def setUp(self):
+        self.request = RequestFactory().get(
+            '/', REMOTE_ADDR='172.18.0.5', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7'
+        )
+
+    @override_settings(TRUSTED_PROXY_COUNT=0)
+    def test_ignores_forwarded_for_without_trusted_proxies(self):
+        self.assertEqual(get_trusted_client_ip(self.request), '172.18.0.5')
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_uses_address_appended_by_trusted_proxy(self):
+        self.assertEqual(get_trusted_client_ip(self.request), '203.0.113.7')
+
+
+@override_settings(LOGIN_FAILURE_LIMIT=100, LOGIN_FAILURE_IP_LIMIT=3, LOGIN_FAILURE_WINDOW=60, TRUSTED_PROXY_COUNT=0)
+class LoginViewThrottleTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(email='member@example.com', username='member', password='pass12345')
+
+    def setUp(self):
+        cache.delete_many(['login:fail:email:member@example.com', 'login:fail:ip:127.0.0.1'])
+
+    def test_rotating_forwarded_for_does_not_bypass_ip_limit(self):
+        for i in range(3):
+            response = self.client.post(
+                reverse('login'), {'email': 'member@example.com', 'password': 'wrong'},
+                format='json', HTTP_X_FORWARDED_FOR=f'198.51.100.{i}'
+            )
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            reverse('login'), {'email': 'member@example.com', 'password': 'pass12345'},
+            format='json', HTTP_X_FORWARDED_FOR='198.51.100.99'
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_non_object_body_is_rejected(self):
+        response = self.client.post(reverse('login'), ['member@example.com'], format='json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,37 @@
+"""
+Logout revokes only the caller's own refresh token
+"""
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from auth_billing.models import AuditLog, User
+
+
+class LogoutTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='member@example.com', username='member', password='pass12345')
+        cls.other = User.objects.create_user(email='other@example.com', username='other', password='pass12345')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_revokes_own_token(self):
+        refresh = RefreshToken.for_user(self.user)
+        response = self.client.post(reverse('logout'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=refresh['jti']).exists())
+
+    def test_rejects_another_users_token(self):
+        refresh = RefreshToken.for_user(self.other)
+        response = self.client.post(reverse('logout'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BlacklistedToken.objects.filter(token__jti=refresh['jti']).exists())
+        self.assertFalse(AuditLog.objects.filter(action='logout').exists())
+
+    def test_rejects_invalid_token_without_auditing(self):
+        response = self.client.post(reverse('logout'), {'refresh': 'not-a-token'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(AuditLog.objects.filter(action='logout').exists())
@@ -0,0 +1,67 @@
+"""
+List endpoints paged by cursor (keyset) pagination
+"""
+from decimal import Decimal
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from auth_billing.models import AuditLog, Invoice, Order, Plan, User
+
+
+class KeysetListTests(APITestCase):
+    """Each cursor-paginated list returns every row exactly once across pages"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pass12345', is_staff=True
+        )
+        cls.plan = Plan.objects.create(name='Basic', slug='basic', price=Decimal('100.00'))
+        for _ in range(3):
+            # Completed orders get their invoice from the post_save signal
+            Order.objects.create(
+                user=cls.admin, plan=cls.plan, amount=Decimal('100.00'),
+                status='completed', paid_at=timezone.now()
+            )
+            AuditLog.objects.create(user=cls.admin, action='login', resource_type='user', resource_id='1')
+        for i in range(2):
+            User.objects.create_user(email=f'user{i}@example.com', username=f'user{i}', password='pass12345')
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def assert_pages_cover(self, url_name, expected_count, **params):
+        response = self.client.get(reverse(url_name), {'page_size': 2, **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        ids = [item['id'] for item in response.data['results']]
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, 200)
+        ids += [item['id'] for item in response.data['results']]
+
+        self.assertEqual(len(ids), expected_count)
+        self.assertEqual(len(set(ids)), expected_count)
+
+    def test_user_list(self):
+        self.assert_pages_cover('user-list', User.objects.count())
+
+    def test_user_list_ordered_by_email(self):
+        self.assert_pages_cover('user-list', User.objects.count(), ordering='email')
+
+    def test_order_list(self):
+        self.assert_pages_cover('order-list', 3)
+
+    def test_invoice_list(self):
+        self.assertEqual(Invoice.objects.count(), 3)
+        self.assert_pages_cover('invoice-list', 3)
+
+    def test_invoice_list_filters_by_order(self):
+        order = Order.objects.order_by('created_at').first()
+        response = self.client.get(reverse('invoice-list'), {'order__external_id': str(order.external_id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['order']['id'] for item in response.data['results']], [str(order.external_id)])
+
+    def test_audit_log_list(self):
+        self.assert_pages_cover('audit-log-list', 3)
@@ -0,0 +1,65 @@
+"""
+Cached, single-flight Plan lookups
+"""
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from auth_billing.models import Plan
+from auth_billing.plan_cache import PLAN_LOCK_WAIT_ATTEMPTS, PLAN_MISS, get_plan_cached, plan_cache_key
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class GetPlanCachedTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.plan = Plan(id=uuid.uuid4(), name='Basic', slug='basic', price=Decimal('100.00'))
+        lookup = patch('auth_billing.plan_cache.Plan')
+        self.addCleanup(lookup.stop)
+        self.first = lookup.start().objects.filter.return_value.first
+        self.first.return_value = self.plan
+        clock = patch('auth_billing.plan_cache.time')
+        self.addCleanup(clock.stop)
+        self.sleep = clock.start().sleep
+
+    def hold_lock(self):
+        cache.add(f'plan:lock:{self.plan.id}', 1)
+
+    def test_hit_skips_database(self):
+        cache.set(plan_cache_key(self.plan.id), self.plan)
+        self.assertEqual(get_plan_cached(self.plan.id), self.plan)
+        self.first.assert_not_called()
+
+    def test_load_caches_plan_and_releases_lock(self):
+        self.assertEqual(get_plan_cached(self.plan.id), self.plan)
+        self.assertEqual(cache.get(plan_cache_key(self.plan.id)), self.plan)
+        self.assertIsNone(cache.get(f'plan:lock:{self.plan.id}'))
+
+    def test_miss_is_cached_as_sentinel(self):
+        self.first.return_value = None
+        self.assertIsNone(get_plan_cached(self.plan.id))
+        self.assertEqual(cache.get(plan_cache_key(self.plan.id)), PLAN_MISS)
+
+        self.assertIsNone(get_plan_cached(self.plan.id))
+        self.assertEqual(self.first.call_count, 1)
+
+    def test_waits_for_worker_holding_lock(self):
+        self.hold_lock()
+        # The other worker fills the cache while this one sleeps
+        self.sleep.side_effect = lambda seconds: cache.set(plan_cache_key(self.plan.id), self.plan)
+        self.assertEqual(get_plan_cached(self.plan.id), self.plan)
+        self.first.assert_not_called()
+
+    def test_waiting_sees_miss_sentinel(self):
+        self.hold_lock()
+        self.sleep.side_effect = lambda seconds: cache.set(plan_cache_key(self.plan.id), PLAN_MISS)
+        self.assertIsNone(get_plan_cached(self.plan.id))
+        self.first.assert_not_called()
+
+    def test_falls_back_to_database_when_lock_holder_stalls(self):
+        self.hold_lock()
+        self.assertEqual(get_plan_cached(self.plan.id), self.plan)
+        self.assertEqual(self.sleep.call_count, PLAN_LOCK_WAIT_ATTEMPTS)
+        self.first.assert_called_once()
@@ -0,0 +1,103 @@
+"""
+Per-worker batching in front of the Redis rate limit counters
+"""
+from unittest.mock import patch
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from auth_billing.middleware import RateLimitMiddleware
+
+
+class FakeRateLimitScript:
+    """Stands in for the Lua script: adds ARGV[1] to both counters of each identifier"""
+
+    def __init__(self, minute_pttl=60000, hour_pttl=3600000):
+        self.counts = {}
+        self.calls = []
+        self.minute_pttl = minute_pttl
+        self.hour_pttl = hour_pttl
+
+    def __call__(self, keys, args):
+        self.calls.append((keys, args))
+        for key in keys:
+            self.counts[key] = self.counts.get(key, 0) + args[0]
+        return [self.counts[keys[0]], self.counts[keys[1]], self.minute_pttl, self.hour_pttl]
+
+    def reset_minute(self):
+        for key in self.counts:
+            if key.startswith(b'rate_limit:m:'):
+                self.counts[key] = 0
+
+
+@override_settings(
+    RATE_LIMIT_PER_MINUTE=5,
+    RATE_LIMIT_PER_HOUR=100,
+    RATE_LIMIT_LOCAL_MAX_ENTRIES=2,
+    RATE_LIMIT_LOCAL_BATCH=3,
+    RATE_LIMIT_LOCAL_FLUSH_INTERVAL=10,
+)
+class RateLimitMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = RateLimitMiddleware(lambda request: HttpResponse('ok'))
+        self.script = self.middleware._script = FakeRateLimitScript()
+        self.now = 1000.0
+        clock = patch('auth_billing.middleware.time')
+        self.addCleanup(clock.stop)
+        clock.start().monotonic.side_effect = lambda: self.now
+
+    def call(self, ip='10.0.0.1'):
+        request = self.factory.get('/api/plans/', REMOTE_ADDR=ip)
+        request.user = AnonymousUser()
+        return self.middleware(request).status_code
+
+    def test_counts_locally_between_syncs(self):
+        for _ in range(3):
+            self.assertEqual(self.call(), 200)
+        # First request syncs; the next two are only counted locally
+        self.assertEqual([args for _, args in self.script.calls], [[1]])
+
+        self.assertEqual(self.call(), 200)
+        # The batch fills: both pending requests go with the current one
+        self.assertEqual([args for _, args in self.script.calls], [[1], [3]])
+
+    def test_flushes_pending_after_interval(self):
+        self.call()
+        self.call()
+        self.now += 11
+        self.call()
+        self.assertEqual([args for _, args in self.script.calls], [[1], [2]])
+
+    def test_rejects_over_limit_from_redis(self):
+        # Another worker has already used up the minute
+        self.script.counts[b'rate_limit:m:i' + bytes([10, 0, 0, 1])] = 5
+        self.assertEqual(self.call(), 429)
+
+    def test_rejects_locally_once_over_limit(self):
+        statuses = [self.call() for _ in range(7)]
+        self.assertEqual(statuses, [200] * 5 + [429] * 2)
+        calls = len(self.script.calls)
+
+        self.assertEqual(self.call(), 429)
+        # Rejected without a Redis round-trip
+        self.assertEqual(len(self.script.calls), calls)
+
+    def test_window_reset_from_pttl(self):
+        self.script.minute_pttl = 2000
+        for _ in range(6):
+            self.call()
+        self.assertEqual(self.call(), 429)
+
+        # The minute key expires in Redis after its PTTL
+        self.script.reset_minute()
+        self.now += 3
+        self.assertEqual(self.call(), 200)
+
+    def test_evicts_least_recently_used_identifier(self):
+        self.call('10.0.0.1')
+        self.call('10.0.0.2')
+        self.call('10.0.0.1')
+        self.call('10.0.0.3')
+        identifiers = list(self.middleware._local)
+        self.assertEqual(identifiers, [b'i' + bytes([10, 0, 0, 1]), b'i' + bytes([10, 0, 0, 3])])
@@ -1,9 +1,33 @@
 """
 Utility functions
 """
+import ipaddress
+import json
+import logging
+import uuid
+from functools import partial
+from contextvars import ContextVar
+from celery import current_app
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
-from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Redis list holding audit log entries waiting to be written
+AUDIT_LOG_QUEUE_KEY = 'audit:queue'
+# Redis list holding entries the database rejected, kept for inspection
+AUDIT_LOG_DEAD_LETTER_KEY = 'audit:dead'
+# Queue length that triggers a flush ahead of the beat schedule
+AUDIT_LOG_EARLY_FLUSH_SIZE = 10000
+
+# Serialized entries collected during the current request, or None outside one
+_audit_buffer = ContextVar('audit_buffer', default=None)
 
 
 def custom_exception_handler(exc, context):
@@ -20,25 +44,129 @@ def get_client_ip(request):
     """Get client IP address from request"""
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
     if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+        return x_forwarded_for.partition(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+def get_trusted_client_ip(request):
+    """
+    Client IP that the client cannot choose
+
+    REMOTE_ADDR, unless TRUSTED_PROXY_COUNT proxies sit in front of the
+    backend; then the address the outermost trusted proxy appended to
+    X-Forwarded-For (entries to its left are client-supplied).
+    """
+    num_proxies = settings.TRUSTED_PROXY_COUNT
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and x_forwarded_for:
+        addresses = x_forwarded_for.split(',')
+        return addresses[-min(num_proxies, len(addresses))].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+def normalize_ip(value):
+    """Canonical text form of an IP address, or None if the value is not one"""
+    try:
+        return str(ipaddress.ip_address(value.strip()))
+    except (AttributeError, ValueError):
+        return None
 
 
 def create_audit_log(user, action, resource_type, resource_id, description='', request=None, metadata=None):
-    """Create audit log entry"""
+    """
+    Queue audit log entry
+
+    The entry is pushed onto a Redis list and written to the database in
+    batches by the flush_audit_logs task, keeping the INSERT off the
+    request path. Within a request the entries are buffered and pushed
+    together by AuditLogFlushMiddleware. An entry created inside an atomic
+    block only joins the buffer once that block commits, so rolled-back
+    work is never audited.
+    """
     audit_data = {
-        'user': user,
+        'external_id': str(uuid.uuid4()),
+        'user_id': str(user.pk) if user else None,
         'action': action,
         'resource_type': resource_type,
         'resource_id': resource_id,
         'description': description,
+        'ip_address': None,
+        'user_agent': '',
         'metadata': metadata or {},
+        'timestamp': timezone.now().isoformat(),
     }
 
     if request:
-        audit_data['ip_address'] = get_client_ip(request)
+        # X-Forwarded-For is client-controlled; only store a valid address
+        audit_data['ip_address'] = normalize_ip(get_client_ip(request))
         audit_data['user_agent'] = request.META.get('HTTP_USER_AGENT', '')
 
-    return AuditLog.objects.create(**audit_data)
+    entry = json.dumps(audit_data, cls=DjangoJSONEncoder)
+    buffer = _audit_buffer.get()
+    if buffer is None:
+        transaction.on_commit(lambda: _push_audit_entries([entry]))
+    elif connection.in_atomic_block:
+        transaction.on_commit(lambda: buffer.append(entry))
+    else:
+        buffer.append(entry)
+
+
+# create_audit_log with the action and resource type bound, one per audited event
+audit_user_create = partial(create_audit_log, action='create', resource_type='user')
+audit_user_login = partial(create_audit_log, action='login', resource_type='user')
+audit_user_logout = partial(create_audit_log, action='logout', resource_type='user')
+audit_user_update = partial(create_audit_log, action='update', resource_type='user')
+audit_user_delete = partial(create_audit_log, action='delete', resource_type='user')
+audit_subscription_create = partial(create_audit_log, action='subscription', resource_type='subscription')
+audit_subscription_update = partial(create_audit_log, action='update', resource_type='subscription')
+audit_order_create = partial(create_audit_log, action='create', resource_type='order')
+audit_order_update = partial(create_audit_log, action='update', resource_type='order')
+audit_order_delete = partial(create_audit_log, action='delete', resource_type='order')
+
+
+def _push_audit_entries(entries):
+    try:
+        queued = get_redis_connection('default').lpush(AUDIT_LOG_QUEUE_KEY, *entries)
+    except RedisError as e:
+        # Redis is unavailable: write the batch straight to the database
+        # rather than failing a request whose own work has committed
+        logger.warning(f"Audit log queue unavailable, writing directly: {str(e)}")
+        from .tasks import write_audit_logs
+        try:
+            write_audit_logs([json.loads(entry) for entry in entries])
+        except Exception as e:
+            # This runs after the response is built; losing the entries
+            # beats turning a completed request into a 500
+            logger.error(f"Failed to write {len(entries)} audit logs directly: {str(e)}")
+        return
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        # No worker or beat in eager mode: write the entries right away
+        from .tasks import flush_audit_logs
+        flush_audit_logs()
+    elif queued - len(entries) < AUDIT_LOG_EARLY_FLUSH_SIZE <= queued:
+        # The queue just filled a whole batch: drain it without waiting for beat
+        try:
+            current_app.send_task('auth_billing.tasks.flush_audit_logs')
+        except Exception as e:
+            # The entries are safely queued; beat drains them on its next run
+            logger.error(f"Failed to schedule early audit log flush: {str(e)}")
+
+
+def start_audit_buffer():
+    """Collect audit entries until end_audit_buffer() instead of queueing each one"""
+    return _audit_buffer.set([])
+
+
+def force_flush():
+    """Queue the buffered audit entries now (once the current transaction commits)"""
+    buffer = _audit_buffer.get()
+    if buffer:
+        entries = buffer[:]
+        buffer.clear()
+        transaction.on_commit(lambda: _push_audit_entries(entries))
+
+
+def end_audit_buffer(token):
+    """Queue the buffered audit entries in one LPUSH and stop buffering"""
+    force_flush()
+    _audit_buffer.reset(token)
@@ -1,34 +1,78 @@
 """
 DRF Views for API endpoints
 """
+import logging
+import uuid
+from datetime import timedelta
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import logout
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
-from drf_spectacular.utils import extend_schema, extend_schema_view
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
+from .authentication import invalidate_cached_user
+from .login_throttle import clear_login_failures, login_blocked, record_login_failure
 from .models import User, Plan, Subscription, Order, Invoice, AuditLog
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserUpdateSerializer,
     PasswordChangeSerializer, LoginSerializer, PlanSerializer,
     SubscriptionSerializer, SubscriptionCreateSerializer,
     SubscriptionStatusSerializer, OrderSerializer, OrderCreateSerializer,
-    InvoiceSerializer, AuditLogSerializer
+    InvoiceSerializer, AuditLogSerializer, AuditLogListSerializer
+)
+from .pagination import CreatedAtKeysetPagination, IssuedAtKeysetPagination, TimestampKeysetPagination
+from .plan_cache import PLAN_HTTP_MAX_AGE, PLAN_LIST_CACHE_TIMEOUT, get_plan_cached, plan_list_cache_key
+from .utils import (
+    audit_order_create, audit_order_delete, audit_order_update,
+    audit_subscription_create, audit_subscription_update, audit_user_create,
+    audit_user_delete, audit_user_login, audit_user_logout, audit_user_update,
+    get_trusted_client_ip
 )
-from .utils import create_audit_log
 
+logger = logging.getLogger(__name__)
 
-# Payment callback view (no authentication required)
-@api_view(['POST'])
-@permission_classes([permissions.AllowAny])
-def process_payment_callback(request):
-    """Process payment callback from payment service"""
+# Subscription length for each Plan.BILLING_CYCLE_CHOICES value
+BILLING_CYCLE_PERIODS = {
+    'monthly': timedelta(days=30),
+    'quarterly': timedelta(days=90),
+    'yearly': timedelta(days=365),
+}
+
+
+def only_nested_user(queryset):
+    """Load all of the model's own columns but only the user columns NestedUserSerializer renders"""
+    own_fields = [field.name for field in queryset.model._meta.concrete_fields]
+    return queryset.only(*own_fields, 'user__id', 'user__username', 'user__email')
+
+
+def _payment_callback_result(success, message, order, verbose):
+    """Callback response; the payment service ignores the body, so the full order is opt-in"""
+    body = {
+        'success': success,
+        'message': message,
+        'order_number': order.order_number,
+        'status': order.status,
+    }
+    if verbose:
+        body['order'] = OrderSerializer(order).data
+    return Response(body)
+
+
+def _handle_payment_callback(request):
+    """Apply a payment result posted by the payment service to its order"""
     order_number = request.data.get('order_number')
     payment_data = request.data.get('payment_data', {})
     payment_status = request.data.get('status')
+    verbose = request.query_params.get('verbose') in ('1', 'true')
 
     if not order_number:
         return Response(
@@ -37,49 +81,46 @@ def process_payment_callback(request):
         )
 
     try:
-        order = Order.objects.get(order_number=order_number)
-        old_status = order.status
+        with transaction.atomic():
+            # Lock the row so concurrent callbacks for the same order are serialised
+            queryset = Order.objects.select_for_update(of=('self',)).select_related('user')
+            if verbose:
+                queryset = queryset.select_related('plan')
+            order = queryset.get(order_number=order_number)
+            old_status = order.status
 
-        # Update order status
-        if payment_status == 'completed':
-            order.status = 'completed'
-            order.paid_at = timezone.now()
-            order.payment_data = payment_data
-            order.save()
-
-            # Create audit log
-            create_audit_log(
-                user=order.user,
-                action='update',
-                resource_type='order',
-                resource_id=str(order.id),
-                description=f'Order {order.order_number} payment completed (was {old_status})',
-                request=request
-            )
+            # Duplicate delivery of a callback that already succeeded
+            if old_status == 'completed':
+                return _payment_callback_result(True, 'Payment already processed', order, verbose)
 
-            return Response({
-                'success': True,
-                'message': 'Payment processed successfully',
-                'order': OrderSerializer(order).data
-            })
-        else:
-            order.status = 'failed'
-            order.save()
-
-            create_audit_log(
-                user=order.user,
-                action='update',
-                resource_type='order',
-                resource_id=str(order.id),
-                description=f'Order {order.order_number} payment failed',
-                request=request
-            )
+            # Update order status
+            if payment_status == 'completed':
+                order.status = 'completed'
+                order.paid_at = timezone.now()
+                order.payment_data = payment_data
+                order.save(update_fields=['status', 'paid_at', 'payment_data', 'updated_at'])
 
-            return Response({
-                'success': False,
-                'message': 'Payment failed',
-                'order': OrderSerializer(order).data
-            })
+                # Create audit log
+                audit_order_update(
+                    user=order.user,
+                    resource_id=str(order.external_id),
+                    description=f'Order {order.order_number} payment completed (was {old_status})',
+                    request=request
+                )
+
+                return _payment_callback_result(True, 'Payment processed successfully', order, verbose)
+            else:
+                order.status = 'failed'
+                order.save(update_fields=['status', 'updated_at'])
+
+                audit_order_update(
+                    user=order.user,
+                    resource_id=str(order.external_id),
+                    description=f'Order {order.order_number} payment failed',
+                    request=request
+                )
+
+                return _payment_callback_result(False, 'Payment failed', order, verbose)
 
     except Order.DoesNotExist:
         return Response(
@@ -93,28 +134,31 @@ def process_payment_callback(request):
         )
 
 
+# Payment callback view (no authentication required)
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+def process_payment_callback(request):
+    """Process payment callback from payment service"""
+    return _handle_payment_callback(request)
+
+
 class RegisterView(APIView):
     """User registration endpoint"""
     permission_classes = [permissions.AllowAny]
 
     @extend_schema(request=UserCreateSerializer, responses={201: UserSerializer})
     def post(self, request):
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        serializer = UserCreateSerializer(data=request.data)
+        serializer = UserCreateSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             user = serializer.save()
-            create_audit_log(
+            audit_user_create(
                 user=user,
-                action='create',
-                resource_type='user',
                 resource_id=str(user.id),
                 description='User registered',
                 request=request
             )
             return Response(
-                UserSerializer(user).data,
+                serializer.data,
                 status=status.HTTP_201_CREATED
             )
         
@@ -130,15 +174,24 @@ class LoginView(APIView):
 
     @extend_schema(request=LoginSerializer)
     def post(self, request):
+        # A JSON array or scalar body has no email; the serializer rejects it
+        email = str(request.data.get('email', '')) if isinstance(request.data, dict) else ''
+        # Not get_client_ip: X-Forwarded-For could be rotated to dodge the IP limit
+        ip = get_trusted_client_ip(request)
+        if login_blocked(email, ip):
+            return Response(
+                {'error': 'Too many failed login attempts. Please try again later.'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+
         serializer = LoginSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             user = serializer.validated_data['user']
+            clear_login_failures(email)
             refresh = RefreshToken.for_user(user)
 
-            create_audit_log(
+            audit_user_login(
                 user=user,
-                action='login',
-                resource_type='user',
                 resource_id=str(user.id),
                 description='User logged in',
                 request=request
@@ -151,6 +204,7 @@ class LoginView(APIView):
                     'access': str(refresh.access_token),
                 }
             })
+        record_login_failure(email, ip)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -159,19 +213,25 @@ class LogoutView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        try:
-            create_audit_log(
-                user=request.user,
-                action='logout',
-                resource_type='user',
-                resource_id=str(request.user.id),
-                description='User logged out',
-                request=request
-            )
-            logout(request)
-            return Response({'message': 'Successfully logged out.'}, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Stateless JWT API: no session to tear down, just revoke the refresh token
+        refresh = request.data.get('refresh') if isinstance(request.data, dict) else None
+        if refresh:
+            try:
+                token = RefreshToken(refresh)
+                if str(token.get('user_id')) != str(request.user.pk):
+                    raise TokenError('Token does not belong to this user')
+                token.blacklist()
+            except TokenError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        audit_user_logout(
+            user=request.user,
+            resource_id=str(request.user.id),
+            description='User logged out',
+            request=request
+        )
+        invalidate_cached_user(request.user.pk)
+        return Response({'message': 'Successfully logged out.'}, status=status.HTTP_200_OK)
 
 
 @extend_schema_view(
@@ -185,9 +245,21 @@ class UserViewSet(viewsets.ModelViewSet):
     """ViewSet for User CRUD operations"""
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['is_active', 'is_verified', 'is_staff']
     search_fields = ['email', 'username', 'first_name', 'last_name']
+    # Cursor pages need a unique ordering: email is unique on its own and the
+    # default breaks created_at ties on id
+    ordering_fields = ['email']
+    ordering = ('-created_at', '-id')
+    pagination_class = CreatedAtKeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Only the columns UserSerializer renders (no password hash etc.)
+            return queryset.only(*UserSerializer.Meta.fields)
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'update' or self.action == 'partial_update':
@@ -211,12 +283,10 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = PasswordChangeSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             request.user.set_password(serializer.validated_data['new_password'])
-            request.user.save()
+            request.user.save(update_fields=['password', 'updated_at'])
 
-            create_audit_log(
+            audit_user_update(
                 user=request.user,
-                action='update',
-                resource_type='user',
                 resource_id=str(request.user.id),
                 description='Password changed',
                 request=request
@@ -244,8 +314,10 @@ class UserViewSet(viewsets.ModelViewSet):
             )
 
         # Check for active subscriptions
-        active_subscriptions = request.user.subscriptions.filter(status='active').count()
-        if active_subscriptions > 0:
+        active_subscriptions = request.user.subscriptions.filter(status='active')
+        if active_subscriptions.exists():
+            # Only count them when the count is actually reported
+            active_subscriptions = active_subscriptions.count()
             return Response(
                 {'error': f'Cannot delete account with {active_subscriptions} active subscription(s). Please cancel them first.'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -254,10 +326,8 @@ class UserViewSet(viewsets.ModelViewSet):
         user_email = request.user.email
         user_id = str(request.user.id)
 
-        create_audit_log(
+        audit_user_delete(
             user=request.user,
-            action='delete',
-            resource_type='user',
             resource_id=user_id,
             description=f'User account {user_email} deleted by user',
             request=request
@@ -272,10 +342,8 @@ class UserViewSet(viewsets.ModelViewSet):
         )
 
     def perform_destroy(self, instance):
-        create_audit_log(
+        audit_user_delete(
             user=self.request.user,
-            action='delete',
-            resource_type='user',
             resource_id=str(instance.id),
             description=f'User {instance.email} deleted',
             request=self.request
@@ -296,23 +364,57 @@ class PlanViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['billing_cycle', 'is_popular']
     search_fields = ['name', 'description']
 
+    def list(self, request, *args, **kwargs):
+        # Public and rarely changing: serve the serialized page from the cache
+        key = plan_list_cache_key(request.query_params)
+        data = cache.get(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            cache.set(key, response.data, PLAN_LIST_CACHE_TIMEOUT)
+            return response
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            plan = get_plan_cached(uuid.UUID(str(kwargs[self.lookup_field])))
+        except ValueError:
+            plan = None
+        if plan is None or not plan.is_active:
+            raise NotFound()
+        return Response(self.get_serializer(plan).data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # Same for every caller, so browsers and CDNs may keep it briefly too
+        if response.status_code == status.HTTP_200_OK:
+            patch_cache_control(response, public=True, max_age=PLAN_HTTP_MAX_AGE)
+        return response
+
 
 @extend_schema_view(
-    list=extend_schema(description='List user subscriptions'),
+    list=extend_schema(
+        description='List user subscriptions',
+        parameters=[OpenApiParameter('active', bool, description='Only currently active subscriptions')],
+    ),
     retrieve=extend_schema(description='Get subscription details'),
     create=extend_schema(description='Create new subscription'),
 )
 class SubscriptionViewSet(viewsets.ModelViewSet):
     """ViewSet for Subscription management"""
+    lookup_field = 'external_id'
+    lookup_url_kwarg = 'pk'
     serializer_class = SubscriptionSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'auto_renew']
 
     def get_queryset(self):
+        queryset = only_nested_user(Subscription.objects.select_related('user', 'plan'))
+        if self.request.query_params.get('active') in ('true', '1'):
+            queryset = queryset.active()
         if self.request.user.is_staff:
-            return Subscription.objects.all()
-        return Subscription.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -320,33 +422,26 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
         return SubscriptionSerializer
 
     def perform_create(self, serializer):
-        plan = Plan.objects.get(id=serializer.validated_data['plan_id'])
+        plan = serializer.validated_data['plan']
 
         # Calculate dates
         start_date = timezone.now()
-        if plan.billing_cycle == 'monthly':
-            end_date = start_date + timezone.timedelta(days=30)
-        elif plan.billing_cycle == 'quarterly':
-            end_date = start_date + timezone.timedelta(days=90)
-        else:  # yearly
-            end_date = start_date + timezone.timedelta(days=365)
-
-        subscription = serializer.save(
-            user=self.request.user,
-            plan=plan,
-            start_date=start_date,
-            end_date=end_date,
-            status='pending'
-        )
+        end_date = start_date + BILLING_CYCLE_PERIODS[plan.billing_cycle]
+
+        with transaction.atomic():
+            subscription = serializer.save(
+                user=self.request.user,
+                start_date=start_date,
+                end_date=end_date,
+                status='pending'
+            )
 
-        create_audit_log(
-            user=self.request.user,
-            action='subscription',
-            resource_type='subscription',
-            resource_id=str(subscription.id),
-            description=f'Subscription created for plan {plan.name}',
-            request=self.request
-        )
+            audit_subscription_create(
+                user=self.request.user,
+                resource_id=str(subscription.external_id),
+                description=f'Subscription created for plan {plan.name}',
+                request=self.request
+            )
 
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
@@ -356,21 +451,27 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
 
         if serializer.is_valid():
             old_status = subscription.status
-            subscription.status = serializer.validated_data['status']
+            update_fields = []
 
-            if 'auto_renew' in serializer.validated_data:
-                subscription.auto_renew = serializer.validated_data['auto_renew']
+            if serializer.validated_data['status'] != old_status:
+                subscription.status = serializer.validated_data['status']
+                update_fields.append('status')
+                if subscription.status == 'cancelled':
+                    subscription.cancelled_at = timezone.now()
+                    update_fields.append('cancelled_at')
 
-            if subscription.status == 'cancelled':
-                subscription.cancelled_at = timezone.now()
+            auto_renew = serializer.validated_data.get('auto_renew')
+            if auto_renew is not None and auto_renew != subscription.auto_renew:
+                subscription.auto_renew = auto_renew
+                update_fields.append('auto_renew')
 
-            subscription.save()
+            # Nothing changed: skip the UPDATE altogether
+            if update_fields:
+                subscription.save(update_fields=update_fields + ['updated_at'])
 
-            create_audit_log(
+            audit_subscription_update(
                 user=request.user,
-                action='update',
-                resource_type='subscription',
-                resource_id=str(subscription.id),
+                resource_id=str(subscription.external_id),
                 description=f'Subscription status changed from {old_status} to {subscription.status}',
                 request=request
             )
@@ -378,6 +479,17 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
             return Response(SubscriptionSerializer(subscription).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Subscription counts, computed in the database"""
+        queryset = Subscription.objects.all()
+        if not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+        return Response(queryset.aggregate(
+            total_subscriptions=Count('id'),
+            active_subscriptions=Count('id', filter=Q(status='active')),
+        ))
+
 
 @extend_schema_view(
     list=extend_schema(description='List user orders'),
@@ -386,16 +498,20 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
 )
 class OrderViewSet(viewsets.ModelViewSet):
     """ViewSet for Order management"""
+    lookup_field = 'external_id'
+    lookup_url_kwarg = 'pk'
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'payment_method']
+    pagination_class = CreatedAtKeysetPagination
     http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
 
     def get_queryset(self):
+        queryset = only_nested_user(Order.objects.select_related('user', 'plan'))
         if self.request.user.is_staff:
-            return Order.objects.all()
-        return Order.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -403,95 +519,41 @@ class OrderViewSet(viewsets.ModelViewSet):
         return OrderSerializer
 
     def create(self, request, *args, **kwargs):
-        """Override create to return full order data"""
+        """Override create to log the new order"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
 
-        create_audit_log(
+        audit_order_create(
             user=request.user,
-            action='create',
-            resource_type='order',
-            resource_id=str(order.id),
+            resource_id=str(order.external_id),
             description=f'Order {order.order_number} created',
             request=request
         )
 
-        # Return full order data using OrderSerializer
-        output_serializer = OrderSerializer(order)
-        headers = self.get_success_headers(output_serializer.data)
-        return Response(output_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+        # OrderCreateSerializer already renders the full order
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny], authentication_classes=[])
     def process_payment(self, request):
         """Process payment callback from payment service"""
-        from django.utils import timezone
+        return _handle_payment_callback(request)
 
-        order_number = request.data.get('order_number')
-        payment_data = request.data.get('payment_data', {})
-        payment_status = request.data.get('status')
-
-        if not order_number:
-            return Response(
-                {'error': 'Order number is required'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        try:
-            order = Order.objects.get(order_number=order_number)
-            old_status = order.status
-
-            # Update order status
-            if payment_status == 'completed':
-                order.status = 'completed'
-                order.paid_at = timezone.now()
-                order.payment_data = payment_data
-                order.save()
-
-                # Create audit log
-                create_audit_log(
-                    user=order.user,
-                    action='update',
-                    resource_type='order',
-                    resource_id=str(order.id),
-                    description=f'Order {order.order_number} payment completed (was {old_status})',
-                    request=request
-                )
-
-                return Response({
-                    'success': True,
-                    'message': 'Payment processed successfully',
-                    'order': OrderSerializer(order).data
-                })
-            else:
-                order.status = 'failed'
-                order.save()
-
-                create_audit_log(
-                    user=order.user,
-                    action='update',
-                    resource_type='order',
-                    resource_id=str(order.id),
-                    description=f'Order {order.order_number} payment failed',
-                    request=request
-                )
-
-                return Response({
-                    'success': False,
-                    'message': 'Payment failed',
-                    'order': OrderSerializer(order).data
-                })
-
-        except Order.DoesNotExist:
-            return Response(
-                {'error': f'Order {order_number} not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        except Exception as e:
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Order counts and total spent, computed in the database"""
+        queryset = Order.objects.all()
+        if not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+        completed = Q(status='completed')
+        stats = queryset.aggregate(
+            total_orders=Count('id'),
+            completed_orders=Count('id', filter=completed),
+            total_spent=Sum('amount', filter=completed),
+        )
+        stats['total_spent'] = stats['total_spent'] or 0
+        return Response(stats)
 
     @action(detail=True, methods=['patch'])
     def cancel(self, request, pk=None):
@@ -507,20 +569,18 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         old_status = order.status
         order.status = 'cancelled'
-        order.save()
-
-        create_audit_log(
-            user=request.user,
-            action='update',
-            resource_type='order',
-            resource_id=str(order.id),
-            description=f'Order {order.order_number} cancelled (was {old_status})',
-            request=request
-        )
+        with transaction.atomic():
+            order.save(update_fields=['status', 'updated_at'])
+            # Cancel related invoice if exists (a single DELETE, no SELECT first)
+            Invoice.objects.filter(order=order).delete()
 
-        # Cancel related invoice if exists
-        if hasattr(order, 'invoice') and order.invoice:
-            order.invoice.delete()
+            # Buffered on commit: dropped if the save or the DELETE fails
+            audit_order_update(
+                user=request.user,
+                resource_id=str(order.external_id),
+                description=f'Order {order.order_number} cancelled (was {old_status})',
+                request=request
+            )
 
         return Response(OrderSerializer(order).data)
 
@@ -537,11 +597,9 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         order_number = order.order_number
 
-        create_audit_log(
+        audit_order_delete(
             user=request.user,
-            action='delete',
-            resource_type='order',
-            resource_id=str(order.id),
+            resource_id=str(order.external_id),
             description=f'Order {order_number} deleted by user',
             request=request
         )
@@ -560,13 +618,20 @@ class OrderViewSet(viewsets.ModelViewSet):
 )
 class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for Invoice (read-only)"""
+    lookup_field = 'external_id'
+    lookup_url_kwarg = 'pk'
     serializer_class = InvoiceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # No OrderingFilter: the cursor takes its ordering from the paginator
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {'order__external_id': ['exact']}
+    pagination_class = IssuedAtKeysetPagination
 
     def get_queryset(self):
+        queryset = Invoice.objects.select_related('user', 'order__user', 'order__plan')
         if self.request.user.is_staff:
-            return Invoice.objects.all()
-        return Invoice.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
 
 
 @extend_schema_view(
@@ -575,8 +640,26 @@ class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
 )
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for AuditLog (read-only, admin only)"""
-    queryset = AuditLog.objects.all()
+    lookup_field = 'external_id'
+    lookup_url_kwarg = 'pk'
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAdminUser]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['action', 'resource_type']
+    filterset_fields = {
+        'action': ['exact'],
+        'resource_type': ['exact'],
+        'user': ['exact'],
+        'timestamp': ['gte', 'lte'],
+    }
+    pagination_class = TimestampKeysetPagination
+
+    def get_queryset(self):
+        if self.action == 'list':
+            # Plain dicts of just the listed columns; no model instances per row
+            return AuditLog.objects.values(*AuditLogListSerializer.row_values)
+        return only_nested_user(AuditLog.objects.select_related('user'))
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return AuditLogListSerializer
+        return AuditLogSerializer
@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'django_filters',
     'drf_spectacular',
@@ -50,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'auth_billing.middleware.RateLimitMiddleware',
+    'auth_billing.middleware.AuditLogFlushMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -81,6 +83,9 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default='postgres'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Reuse connections across requests instead of reconnecting each time
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -127,11 +132,15 @@ AUTH_USER_MODEL = 'auth_billing.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'auth_billing.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'auth_billing.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
@@ -189,13 +198,41 @@ CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_RESULT_EXTENDED = True
+CELERY_TASK_ROUTES = {
+    'auth_billing.tasks.flush_audit_logs': {'queue': 'audit'},
+    'auth_billing.tasks.purge_old_audit_logs': {'queue': 'audit'},
+}
 
 # Celery Beat Schedule
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'flush-audit-logs': {
+        'task': 'auth_billing.tasks.flush_audit_logs',
+        'schedule': config('AUDIT_LOG_FLUSH_INTERVAL', default=5.0, cast=float),
+    },
+    'purge-old-audit-logs': {
+        'task': 'auth_billing.tasks.purge_old_audit_logs',
+        'schedule': 24 * 60 * 60,
+    },
+}
+
+# Audit Logs (days to keep; 0 keeps them forever)
+AUDIT_LOG_RETENTION_DAYS = config('AUDIT_LOG_RETENTION_DAYS', default=365, cast=int)
 
 # Rate Limiting
 RATE_LIMIT_PER_MINUTE = config('RATE_LIMIT_PER_MINUTE', default=60, cast=int)
 RATE_LIMIT_PER_HOUR = config('RATE_LIMIT_PER_HOUR', default=1000, cast=int)
+# Per-worker counter cache in front of Redis
+RATE_LIMIT_LOCAL_MAX_ENTRIES = config('RATE_LIMIT_LOCAL_MAX_ENTRIES', default=10000, cast=int)
+RATE_LIMIT_LOCAL_BATCH = config('RATE_LIMIT_LOCAL_BATCH', default=10, cast=int)
+RATE_LIMIT_LOCAL_FLUSH_INTERVAL = config('RATE_LIMIT_LOCAL_FLUSH_INTERVAL', default=0.1, cast=float)
+
+# Login Throttling (failed attempts per email / per IP within the window, in seconds)
+LOGIN_FAILURE_LIMIT = config('LOGIN_FAILURE_LIMIT', default=5, cast=int)
+LOGIN_FAILURE_IP_LIMIT = config('LOGIN_FAILURE_IP_LIMIT', default=50, cast=int)
+LOGIN_FAILURE_WINDOW = config('LOGIN_FAILURE_WINDOW', default=15 * 60, cast=int)
+# Reverse proxies that append to X-Forwarded-For; 0 trusts only REMOTE_ADDR
+TRUSTED_PROXY_COUNT = config('TRUSTED_PROXY_COUNT', default=0, cast=int)
 
 # Service URLs
 PAYMENT_SERVICE_URL = config('PAYMENT_SERVICE_URL', default='http://localhost:8001')
@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
 from auth_billing.models import Plan
+from auth_billing.plan_cache import invalidate_plans
 
 # Create sample plans
 plans_data = [
@@ -72,17 +73,26 @@ plans_data = [
     }
 ]
 
-created_count = 0
+existing_slugs = set(
+    Plan.objects.filter(slug__in=[plan_data['slug'] for plan_data in plans_data]).values_list('slug', flat=True)
+)
+new_plans = [Plan(**plan_data) for plan_data in plans_data if plan_data['slug'] not in existing_slugs]
+
+# One INSERT for all missing plans; ignore_conflicts covers a concurrent run
+Plan.objects.bulk_create(new_plans, ignore_conflicts=True)
+# IDs are generated here, so re-selecting them finds only the rows this run
+# inserted, not the ones a concurrent run got in first
+created_plans = list(Plan.objects.filter(id__in=[plan.id for plan in new_plans]).order_by('sort_order'))
+created_count = len(created_plans)
+
+# bulk_create skips post_save, so drop the cached plan catalog by hand
+invalidate_plans([plan.id for plan in created_plans])
+for plan in created_plans:
+    print(f"✓ Created plan: {plan.name} - ${plan.price}/{plan.billing_cycle}")
+created_slugs = {plan.slug for plan in created_plans}
 for plan_data in plans_data:
-    plan, created = Plan.objects.get_or_create(
-        slug=plan_data['slug'],
-        defaults=plan_data
-    )
-    if created:
-        created_count += 1
-        print(f"✓ Created plan: {plan.name} - ${plan.price}/{plan.billing_cycle}")
-    else:
-        print(f"• Plan already exists: {plan.name}")
+    if plan_data['slug'] not in created_slugs:
+        print(f"• Plan already exists: {plan_data['name']}")
 
 print(f"\n{'='*50}")
 print(f"Total plans created: {created_count}")
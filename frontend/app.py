@@ -1,12 +1,97 @@
 """
 Streamlit Frontend - Main Application
 """
+import html
+import string
 import streamlit as st
+from collections import defaultdict
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
 from streamlit_option_menu import option_menu
 from config import PAGE_TITLE, PAGE_ICON, LAYOUT
-from utils.api_client import APIClient
+from utils.api_client import APIClient, start_parallel
 from utils.auth import is_authenticated, get_current_user
 
+# Checkout tax (5% Taiwan business tax, same as the backend invoices)
+TAX_RATE = Decimal('0.05')
+CENT = Decimal('0.01')
+
+# Display labels, built once instead of on every render
+STATUS_COLORS = {
+    'pending': '🟡',
+    'processing': '🔵',
+    'completed': '🟢',
+    'active': '🟢',
+    'failed': '🔴',
+    'cancelled': '⚫',
+    'expired': '⚫'
+}
+PAYMENT_METHOD_LABELS = {
+    "credit_card": "💳 Credit Card",
+    "atm": "🏦 ATM Transfer",
+    "cvs": "🏪 Convenience Store",
+    "barcode": "📊 Barcode"
+}
+
+DASHBOARD_METRICS = ("Active Subscriptions", "Total Orders", "Completed Payments", "Total Spent")
+
+# Invoices shown per "Load more" step
+INVOICES_PAGE_SIZE = 20
+
+# ECPay redirect page; only the form action and hidden fields vary per order
+ECPAY_FORM_TEMPLATE = string.Template("""\
+    <html>
+    <head>
+        <meta charset="utf-8">
+        <style>
+            body {
+                font-family: Arial, sans-serif;
+                text-align: center;
+                padding: 20px;
+            }
+            .payment-button {
+                background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
+                color: white;
+                border: none;
+                padding: 20px 50px;
+                font-size: 18px;
+                font-weight: bold;
+                border-radius: 10px;
+                cursor: pointer;
+                margin: 20px;
+                box-shadow: 0 4px 6px rgba(0,0,0,0.2);
+                transition: all 0.3s;
+            }
+            .payment-button:hover {
+                transform: translateY(-2px);
+                box-shadow: 0 6px 8px rgba(0,0,0,0.3);
+            }
+            .info {
+                color: #666;
+                margin-top: 20px;
+                font-size: 14px;
+            }
+        </style>
+    </head>
+    <body>
+        <form id="ecpay_form" method="post" action="$action" target="_blank">
+$fields
+            <button type="submit" class="payment-button" onclick="showMessage()">
+                💳 Open ECPay Payment Gateway
+            </button>
+        </form>
+        <div class="info" id="message"></div>
+
+        <script>
+            function showMessage() {
+                document.getElementById('message').innerHTML = '✅ Payment window opened! Please complete the payment in the new window.';
+            }
+        </script>
+    </body>
+    </html>
+""")
+
 # Page configuration
 st.set_page_config(
     page_title=PAGE_TITLE,
@@ -15,69 +100,43 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+
+@st.cache_resource
+def get_api_client() -> APIClient:
+    """One APIClient per server process; it keeps no per-user state"""
+    return APIClient()
+
+
 # Initialize API client
-api_client = APIClient()
+api_client = get_api_client()
+
+
+@st.cache_resource
+def load_css():
+    """Read the stylesheet once per server process"""
+    return (Path(__file__).parent / 'static' / 'styles.css').read_text()
+
 
 # Custom CSS - High Contrast Theme
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 3rem;
-        font-weight: 900;
-        text-align: center;
-        margin-bottom: 2rem;
-        color: #FFFFFF;
-        text-shadow: 2px 2px 4px rgba(0,0,0,0.8);
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        padding: 20px;
-        border-radius: 15px;
-        border: 3px solid #FFFFFF;
-    }
-
-    /* Dark mode support */
-    @media (prefers-color-scheme: dark) {
-        .main-header {
-            color: #FFFFFF;
-            border-color: #FFFFFF;
-            text-shadow: 3px 3px 6px rgba(0,0,0,0.9);
-        }
-    }
-
-    /* Light mode support */
-    @media (prefers-color-scheme: light) {
-        .main-header {
-            color: #FFFFFF;
-            border-color: #4B5563;
-            background: linear-gradient(135deg, #4F46E5 0%, #7C3AED 100%);
-        }
-    }
-
-    .plan-card {
-        border: 2px solid #e0e0e0;
-        border-radius: 10px;
-        padding: 20px;
-        margin: 10px 0;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    .plan-card:hover {
-        box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-        border-color: #667eea;
-    }
-    .popular-badge {
-        background-color: #ffd700;
-        color: #000;
-        padding: 5px 10px;
-        border-radius: 20px;
-        font-weight: bold;
-        font-size: 0.8rem;
-    }
-</style>
-""", unsafe_allow_html=True)
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
+
+
+def render_header(title):
+    """Page title in the gradient header style (escaped, since titles can carry user data)"""
+    st.markdown(f'<h1 class="main-header">{html.escape(title)}</h1>', unsafe_allow_html=True)
+
+
+def group_by_status(items):
+    """Bucket API rows by their status in one pass"""
+    groups = defaultdict(list)
+    for item in items:
+        groups[item['status']].append(item)
+    return groups
 
 
 def show_login_page():
     """Login page"""
-    st.markdown('<h1 class="main-header">🎨 Fluxus Imago Fabrica</h1>', unsafe_allow_html=True)
+    render_header('🎨 Fluxus Imago Fabrica')
 
     # Show success message if redirected from registration
     if 'registration_success' in st.session_state and st.session_state['registration_success']:
@@ -147,28 +206,35 @@ def show_dashboard():
     """Main dashboard"""
     user = get_current_user()
 
-    st.markdown(f'<h1 class="main-header">Welcome, {user["username"]}! 👋</h1>', unsafe_allow_html=True)
-
-    # Get user data
-    subscriptions = api_client.get_subscriptions()
-    orders = api_client.get_orders()
+    render_header(f'Welcome, {user["username"]}! 👋')
 
-    # Dashboard metrics
-    col1, col2, col3, col4 = st.columns(4)
+    # Get user data (all requests in flight at once); the metrics are
+    # aggregated by the backend, so only the rows shown here are fetched
+    subscription_stats_future, order_stats_future, subscriptions_future, orders_future = start_parallel(
+        api_client.get_subscription_stats,
+        api_client.get_order_stats,
+        api_client.get_subscriptions,
+        lambda: api_client.get_orders(limit=5),
+    )
 
-    with col1:
-        st.metric("Active Subscriptions", len([s for s in subscriptions if s['status'] == 'active']))
+    # Dashboard metrics: placeholders go out first and are filled in as
+    # the stats arrive, so the page does not wait blank on the requests
+    metric_slots = [col.empty() for col in st.columns(4)]
+    for slot, label in zip(metric_slots, DASHBOARD_METRICS):
+        slot.metric(label, "…")
 
-    with col2:
-        st.metric("Total Orders", len(orders))
+    subscription_stats = subscription_stats_future.result()
+    metric_slots[0].metric("Active Subscriptions", subscription_stats.get('active_subscriptions', 0))
 
-    with col3:
-        completed_orders = len([o for o in orders if o['status'] == 'completed'])
-        st.metric("Completed Payments", completed_orders)
+    order_stats = order_stats_future.result()
+    metric_slots[1].metric("Total Orders", order_stats.get('total_orders', 0))
+    metric_slots[2].metric("Completed Payments", order_stats.get('completed_orders', 0))
+    total_spent = float(order_stats.get('total_spent', 0))
+    metric_slots[3].metric("Total Spent", f"${total_spent:.2f}")
 
-    with col4:
-        total_spent = sum([float(o['amount']) for o in orders if o['status'] == 'completed'])
-        st.metric("Total Spent", f"${total_spent:.2f}")
+    with st.spinner("Loading your subscriptions and orders..."):
+        subscriptions = subscriptions_future.result()
+        orders = orders_future.result()
 
     st.divider()
 
@@ -178,34 +244,31 @@ def show_dashboard():
     active_subscriptions = [sub for sub in subscriptions if sub['status'] != 'cancelled']
     if active_subscriptions:
         for sub in active_subscriptions[:5]:
-            with st.container():
-                col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
-                with col1:
-                    st.write(f"**{sub['plan']['name']}**")
-                with col2:
-                    st.write(f"Status: **{sub['status'].upper()}**")
-                with col3:
-                    st.write(f"${sub['plan']['price']}/{sub['plan']['billing_cycle']}")
-                with col4:
-                    if sub['status'] == 'active':
-                        if st.button("❌ Cancel", key=f"cancel_{sub['id']}", help="Cancel this subscription"):
-                            # Show confirmation in session state
-                            st.session_state[f'confirm_cancel_sub_{sub["id"]}'] = True
-                            st.rerun()
+            confirming = st.session_state.get(f'confirm_cancel_sub_{sub["id"]}', False)
+            with st.expander(
+                f"**{sub['plan']['name']}** — {sub['status'].upper()} — "
+                f"${sub['plan']['price']}/{sub['plan']['billing_cycle']}",
+                expanded=confirming
+            ):
+                st.caption(f"Ends {sub['end_date'][:10]}")
+                if sub['status'] == 'active':
+                    if st.button("❌ Cancel", key=f"cancel_{sub['id']}", help="Cancel this subscription"):
+                        # Show confirmation in session state
+                        st.session_state[f'confirm_cancel_sub_{sub["id"]}'] = True
+                        st.rerun()
 
-                        # Check if confirmation is needed
-                        if st.session_state.get(f'confirm_cancel_sub_{sub["id"]}'):
-                            st.warning("⚠️ Are you sure? Click Cancel again to confirm.")
-                            if st.button("✅ Confirm Cancel", key=f"confirm_cancel_{sub['id']}", type="primary"):
-                                result = api_client.update_subscription_status(sub['id'], 'cancelled')
-                                if result:
-                                    st.success("Subscription cancelled successfully!")
-                                    st.session_state.pop(f'confirm_cancel_sub_{sub["id"]}', None)
-                                    st.rerun()
-                            if st.button("↩️ Keep Subscription", key=f"keep_sub_{sub['id']}"):
+                    # Check if confirmation is needed
+                    if confirming:
+                        st.warning("⚠️ Are you sure? Click Cancel again to confirm.")
+                        if st.button("✅ Confirm Cancel", key=f"confirm_cancel_{sub['id']}", type="primary"):
+                            result = api_client.update_subscription_status(sub['id'], 'cancelled')
+                            if result:
+                                st.success("Subscription cancelled successfully!")
                                 st.session_state.pop(f'confirm_cancel_sub_{sub["id"]}', None)
                                 st.rerun()
-                st.divider()
+                        if st.button("↩️ Keep Subscription", key=f"keep_sub_{sub['id']}"):
+                            st.session_state.pop(f'confirm_cancel_sub_{sub["id"]}', None)
+                            st.rerun()
     else:
         st.info("No active subscriptions. Browse plans to get started!")
 
@@ -246,73 +309,69 @@ def show_dashboard():
     combined_items.sort(key=lambda x: x['date'], reverse=True)
 
     if combined_items:
-        for item in combined_items[:10]:
-            with st.container():
-                col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 2])
-                with col1:
-                    icon = "📦" if item['type'] == 'order' else "💎"
-                    st.write(f"{icon} **{item['number']}**")
-                    st.caption(item['plan_name'])
-                with col2:
-                    status_color = {
-                        'pending': '🟡',
-                        'processing': '🔵',
-                        'completed': '🟢',
-                        'active': '🟢',
-                        'failed': '🔴',
-                        'cancelled': '⚫',
-                        'expired': '⚫'
-                    }
-                    status_display = 'ACHIEVED' if item['status'] == 'completed' else item['status'].upper()
-                    st.write(f"{status_color.get(item['status'], '⚪')} {status_display}")
-                with col3:
-                    st.write(f"${item['amount']}")
-                with col4:
-                    st.write(item['date'])
-                with col5:
-                    # Show appropriate action buttons based on type and status
-                    if item['type'] == 'order':
-                        order = item['data']
-                        if order['status'] == 'pending':
-                            # For pending orders, show "Pay Now" button
-                            if st.button("💳 Pay", key=f"pay_order_{order['id']}", help="Continue to payment"):
-                                # Get plan details for payment
-                                if order.get('plan'):
-                                    payment = api_client.create_payment(
-                                        order_id=order['id'],
-                                        order_number=order['order_number'],
-                                        amount=int(float(order['amount'])),
-                                        item_name=order['plan']['name'],
-                                        payment_method=order.get('payment_method', 'credit_card')
-                                    )
-                                    if payment and payment.get('success'):
-                                        st.session_state['payment_data'] = payment
-                                        st.session_state['order'] = order
-                                        st.session_state['show_payment_form'] = True
-                                        st.rerun()
-                        elif order['status'] in ['pending', 'processing', 'failed']:
-                            # For pending/processing/failed orders, show cancel button
-                            if st.button("❌", key=f"cancel_order_{order['id']}", help="Cancel order"):
-                                result = api_client.cancel_order(order['id'])
-                                if result:
-                                    st.success("Order cancelled")
-                                    st.rerun()
-                    elif item['type'] == 'subscription':
-                        sub = item['data']
-                        if sub['status'] == 'active':
-                            if st.button("❌ Cancel", key=f"cancel_sub_dash_{sub['id']}", help="Cancel subscription"):
-                                result = api_client.update_subscription_status(sub['id'], 'cancelled')
-                                if result:
-                                    st.success("Subscription cancelled!")
-                                    st.rerun()
-                st.divider()
+        recent_items = combined_items[:10]
+
+        # One table for the summary rows instead of a widget row per item
+        st.dataframe(
+            [
+                {
+                    'Number': f"{'📦' if item['type'] == 'order' else '💎'} {item['number']}",
+                    'Plan': item['plan_name'],
+                    'Status': f"{STATUS_COLORS.get(item['status'], '⚪')} "
+                              f"{'ACHIEVED' if item['status'] == 'completed' else item['status'].upper()}",
+                    'Amount': float(item['amount']),
+                    'Date': item['date'],
+                }
+                for item in recent_items
+            ],
+            column_config={'Amount': st.column_config.NumberColumn(format='$%.2f')},
+            hide_index=True,
+            use_container_width=True
+        )
+
+        # Action buttons only for the items that have one
+        for item in recent_items:
+            if item['type'] == 'order':
+                order = item['data']
+                if order['status'] == 'pending':
+                    # For pending orders, show "Pay Now" button
+                    if st.button(f"💳 Pay {order['order_number']}", key=f"pay_order_{order['id']}", help="Continue to payment"):
+                        # Get plan details for payment
+                        if order.get('plan'):
+                            payment = api_client.create_payment(
+                                order_id=order['id'],
+                                order_number=order['order_number'],
+                                amount=int(float(order['amount'])),
+                                item_name=order['plan']['name'],
+                                payment_method=order.get('payment_method', 'credit_card')
+                            )
+                            if payment and payment.get('success'):
+                                st.session_state['payment_data'] = payment
+                                st.session_state['order'] = order
+                                st.session_state['show_payment_form'] = True
+                                st.rerun()
+                elif order['status'] in ['processing', 'failed']:
+                    # For processing/failed orders, show cancel button
+                    if st.button(f"❌ Cancel {order['order_number']}", key=f"cancel_order_{order['id']}", help="Cancel order"):
+                        result = api_client.cancel_order(order['id'])
+                        if result:
+                            st.success("Order cancelled")
+                            st.rerun()
+            elif item['type'] == 'subscription':
+                sub = item['data']
+                if sub['status'] == 'active':
+                    if st.button(f"❌ Cancel {item['number']}", key=f"cancel_sub_dash_{sub['id']}", help="Cancel subscription"):
+                        result = api_client.update_subscription_status(sub['id'], 'cancelled')
+                        if result:
+                            st.success("Subscription cancelled!")
+                            st.rerun()
     else:
         st.info("No orders yet")
 
 
 def show_plans_page():
     """Plans and pricing page"""
-    st.markdown('<h1 class="main-header">💎 Choose Your Plan</h1>', unsafe_allow_html=True)
+    render_header('💎 Choose Your Plan')
 
     plans = api_client.get_plans()
 
@@ -365,7 +424,12 @@ def show_checkout_page():
 
     plan = st.session_state['selected_plan']
 
-    st.markdown('<h1 class="main-header">🛒 Checkout</h1>', unsafe_allow_html=True)
+    # Price math once per run, in Decimal so the cents are exact
+    price = Decimal(str(plan['price']))
+    tax = (price * TAX_RATE).quantize(CENT)
+    total = price + tax
+
+    render_header('🛒 Checkout')
     
     # Back button
     if st.button("← Back to Plans"):
@@ -390,12 +454,7 @@ def show_checkout_page():
         payment_method = st.selectbox(
             "Select Payment Method",
             options=["credit_card", "atm", "cvs", "barcode"],
-            format_func=lambda x: {
-                "credit_card": "💳 Credit Card",
-                "atm": "🏦 ATM Transfer",
-                "cvs": "🏪 Convenience Store",
-                "barcode": "📊 Barcode"
-            }[x]
+            format_func=PAYMENT_METHOD_LABELS.__getitem__
         )
 
         notes = st.text_area("Notes (Optional)", placeholder="Add any notes here...")
@@ -403,10 +462,9 @@ def show_checkout_page():
     with col2:
         st.subheader("Price Details")
         st.write(f"Plan Price: ${plan['price']}")
-        st.write(f"Tax (5%): ${float(plan['price']) * 0.05:.2f}")
+        st.write(f"Tax (5%): ${tax}")
         st.write("---")
-        total = float(plan['price']) * 1.05
-        st.write(f"**Total: ${total:.2f}**")
+        st.write(f"**Total: ${total}**")
 
     st.divider()
 
@@ -433,7 +491,7 @@ def show_checkout_page():
                     payment = api_client.create_payment(
                         order_id=order['id'],
                         order_number=order['order_number'],
-                        amount=int(float(plan['price'])),
+                        amount=int(price),
                         item_name=plan['name'],
                         payment_method=payment_method
                     )
@@ -464,7 +522,7 @@ def show_payment_form():
     payment = st.session_state['payment_data']
     order = st.session_state['order']
 
-    st.markdown('<h1 class="main-header">🔄 Redirecting to Payment Gateway</h1>', unsafe_allow_html=True)
+    render_header('🔄 Redirecting to Payment Gateway')
 
     # Add cancel button at the top
     col1, col2 = st.columns([6, 1])
@@ -483,63 +541,15 @@ def show_payment_form():
     st.write("Click the button below to open ECPay payment gateway in a new window.")
     st.info("💡 **Tip**: If the window doesn't open, please allow pop-ups for this site.")
 
-    # Generate ECPay form that opens in new window
-    form_html = f"""
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                text-align: center;
-                padding: 20px;
-            }}
-            .payment-button {{
-                background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                border: none;
-                padding: 20px 50px;
-                font-size: 18px;
-                font-weight: bold;
-                border-radius: 10px;
-                cursor: pointer;
-                margin: 20px;
-                box-shadow: 0 4px 6px rgba(0,0,0,0.2);
-                transition: all 0.3s;
-            }}
-            .payment-button:hover {{
-                transform: translateY(-2px);
-                box-shadow: 0 6px 8px rgba(0,0,0,0.3);
-            }}
-            .info {{
-                color: #666;
-                margin-top: 20px;
-                font-size: 14px;
-            }}
-        </style>
-    </head>
-    <body>
-        <form id="ecpay_form" method="post" action="{payment['payment_url']}" target="_blank">
-    """
-
-    for key, value in payment['form_data'].items():
-        form_html += f'<input type="hidden" name="{key}" value="{value}">\n'
-
-    form_html += """
-            <button type="submit" class="payment-button" onclick="showMessage()">
-                💳 Open ECPay Payment Gateway
-            </button>
-        </form>
-        <div class="info" id="message"></div>
-
-        <script>
-            function showMessage() {
-                document.getElementById('message').innerHTML = '✅ Payment window opened! Please complete the payment in the new window.';
-            }
-        </script>
-    </body>
-    </html>
-    """
+    # Generate ECPay form that opens in new window; values are escaped
+    # since they are interpolated into HTML attributes
+    form_html = ECPAY_FORM_TEMPLATE.substitute(
+        action=html.escape(payment['payment_url']),
+        fields=''.join(
+            f'<input type="hidden" name="{html.escape(str(key))}" value="{html.escape(str(value))}">\n'
+            for key, value in payment['form_data'].items()
+        )
+    )
 
     st.components.v1.html(form_html, height=200, scrolling=False)
 
@@ -559,7 +569,7 @@ def show_payment_form():
 
 def show_subscriptions_page():
     """Subscriptions management page"""
-    st.markdown('<h1 class="main-header">💎 My Subscriptions</h1>', unsafe_allow_html=True)
+    render_header('💎 My Subscriptions')
 
     subscriptions = api_client.get_subscriptions()
 
@@ -580,14 +590,15 @@ def show_subscriptions_page():
             index=0
         )
 
-    # Filter subscriptions
+    # Filter and count subscriptions from a single pass
+    subs_by_status = group_by_status(subscriptions)
     if status_filter != "All":
-        filtered_subs = [s for s in subscriptions if s['status'] == status_filter.lower()]
+        filtered_subs = subs_by_status[status_filter.lower()]
     else:
         filtered_subs = subscriptions
 
     # Count active subscriptions
-    active_subs = [s for s in subscriptions if s['status'] == 'active']
+    active_subs = subs_by_status['active']
 
     # Display stats
     col1, col2 = st.columns(2)
@@ -658,7 +669,7 @@ def show_subscriptions_page():
 
 def show_orders_page():
     """Orders management page"""
-    st.markdown('<h1 class="main-header">📦 My Orders</h1>', unsafe_allow_html=True)
+    render_header('📦 My Orders')
 
     orders = api_client.get_orders()
 
@@ -675,14 +686,15 @@ def show_orders_page():
             index=0
         )
 
-    # Filter orders
+    # Filter and count orders from a single pass
+    orders_by_status = group_by_status(orders)
     if status_filter != "All":
-        filtered_orders = [o for o in orders if o['status'] == status_filter.lower()]
+        filtered_orders = orders_by_status[status_filter.lower()]
     else:
         filtered_orders = orders
 
     # Count cancelled orders
-    cancelled_orders = [o for o in orders if o['status'] == 'cancelled']
+    cancelled_orders = orders_by_status['cancelled']
 
     # Display stats and bulk delete button
     col1, col2, col3 = st.columns([2, 2, 1])
@@ -780,9 +792,13 @@ def show_orders_page():
 
 def show_invoices_page():
     """Invoices page"""
-    st.markdown('<h1 class="main-header">📄 Invoices</h1>', unsafe_allow_html=True)
+    render_header('📄 Invoices')
 
-    invoices = api_client.get_invoices()
+    # Only fetch the invoice pages that are actually shown
+    shown = st.session_state.get('invoices_shown', INVOICES_PAGE_SIZE)
+    invoices = list(islice(api_client.iter_invoices(page_size=INVOICES_PAGE_SIZE), shown + 1))
+    has_more = len(invoices) > shown
+    invoices = invoices[:shown]
 
     if not invoices:
         st.info("No invoices yet")
@@ -807,10 +823,14 @@ def show_invoices_page():
             if invoice.get('pdf_url'):
                 st.link_button("Download PDF", invoice['pdf_url'])
 
+    if has_more and st.button("Load more invoices"):
+        st.session_state['invoices_shown'] = shown + INVOICES_PAGE_SIZE
+        st.rerun()
+
 
 def show_payment_result():
     """Payment result page (shown after ECPay redirect) - No authentication required"""
-    st.markdown('<h1 class="main-header">💳 Payment Result</h1>', unsafe_allow_html=True)
+    render_header('💳 Payment Result')
 
     # Get query parameters from URL
     query_params = st.query_params
@@ -820,6 +840,9 @@ def show_payment_result():
 
     # Check if we have payment result info
     if 'RtnCode' in query_params or 'status' in query_params:
+        # The payment callback has changed order state behind the cache
+        api_client.invalidate()
+
         # ECPay returns with RtnCode parameter
         rtn_code = query_params.get('RtnCode', ['0'])[0] if isinstance(query_params.get('RtnCode', '0'), list) else query_params.get('RtnCode', '0')
 
@@ -994,7 +1017,7 @@ def main():
     elif selected == "Invoices":
         show_invoices_page()
     elif selected == "Settings":
-        st.markdown('<h1 class="main-header">⚙️ Settings</h1>', unsafe_allow_html=True)
+        render_header('⚙️ Settings')
 
         user = get_current_user()
 
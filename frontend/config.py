@@ -20,6 +20,14 @@ API_SUBSCRIPTIONS = f"{BACKEND_URL}/api/subscriptions/"
 API_ORDERS = f"{BACKEND_URL}/api/orders/"
 API_INVOICES = f"{BACKEND_URL}/api/invoices/"
 
+API_USERS_DELETE_ACCOUNT = f"{BACKEND_URL}/api/users/delete_account/"
+API_SUBSCRIPTIONS_STATS = f"{API_SUBSCRIPTIONS}stats/"
+API_ORDERS_STATS = f"{API_ORDERS}stats/"
+# Per-resource endpoints; fill in with .format(id=...)
+API_SUBSCRIPTION_STATUS = API_SUBSCRIPTIONS + "{id}/update_status/"
+API_ORDER_DETAIL = API_ORDERS + "{id}/"
+API_ORDER_CANCEL = API_ORDERS + "{id}/cancel/"
+
 API_PAYMENT_CREATE = f"{PAYMENT_SERVICE_URL}/payment/ecpay/create/"
 API_PAYMENT_INVOICE = f"{PAYMENT_SERVICE_URL}/payment/invoice/"
 
@@ -27,6 +35,7 @@ API_PAYMENT_INVOICE = f"{PAYMENT_SERVICE_URL}/payment/invoice/"
 SESSION_USER = 'user'
 SESSION_ACCESS_TOKEN = 'access_token'
 SESSION_REFRESH_TOKEN = 'refresh_token'
+SESSION_CACHE_GENERATION = 'cache_generation'
 
 # Page config
 PAGE_TITLE = "Fluxus Imago Fabrica"
@@ -1,11 +1,91 @@
 """
 API Client for backend communication
 """
+import orjson
+import re
 import requests
 import streamlit as st
-from typing import Optional, Dict, Any
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from typing import Optional, Dict, Any, Callable, Iterator, List, Tuple
 from config import *
 
+PUBLIC_CACHE_TTL = 300  # seconds; plans change rarely
+PRIVATE_CACHE_TTL = 60  # seconds; per-user data
+
+
+REQUEST_TIMEOUT = (3, 10)  # seconds (connect, read)
+REFRESH_REUSE_WINDOW = 2.0  # seconds a token refresh result is shared
+
+# Order payment methods mapped to ECPay's ChoosePayment values
+ECPAY_PAYMENT_METHODS = {
+    'credit_card': 'Credit',
+    'atm': 'ATM',
+    'cvs': 'CVS',
+    'barcode': 'BARCODE'
+}
+
+
+class _TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies REQUEST_TIMEOUT to calls that do not set their own"""
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = REQUEST_TIMEOUT
+        return super().send(request, **kwargs)
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """HTTP session shared by every rerun and user, so connections are reused"""
+    session = requests.Session()
+    # Read errors and gateway errors are only retried for idempotent
+    # methods, so a POST (e.g. creating an order) is never replayed
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504), raise_on_status=False)
+    adapter = _TimeoutHTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _get_json(url: str, token: Optional[str]) -> Any:
+    """GET a JSON resource; error responses raise so they are never cached"""
+    headers = {'Authorization': f"Bearer {token}"} if token else {}
+    response = get_session().get(url, headers=headers)
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
+@st.cache_data(ttl=PUBLIC_CACHE_TTL, show_spinner=False)
+def _fetch_public(url: str) -> Any:
+    return _get_json(url, None)
+
+
+@st.cache_data(ttl=PRIVATE_CACHE_TTL, show_spinner=False)
+def _fetch_private(url: str, token: str, generation: int) -> Any:
+    # Keyed on the access token, so each login gets its own entries, and on
+    # the session's cache generation, so one user's writes only drop their own
+    return _get_json(url, token)
+
+
+def start_parallel(*calls: Callable[[], Any]) -> List[Future]:
+    """Start independent API calls concurrently and return their futures in order"""
+    # Worker threads get the script context so st.session_state and
+    # st.error keep working inside the calls
+    executor = ThreadPoolExecutor(
+        max_workers=len(calls),
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx())
+    )
+    futures = [executor.submit(call) for call in calls]
+    # Workers exit on their own once the calls are done
+    executor.shutdown(wait=False)
+    return futures
+
 
 class APIClient:
     """API Client for communicating with backend services"""
@@ -13,6 +93,11 @@ class APIClient:
     def __init__(self):
         self.backend_url = BACKEND_URL
         self.payment_url = PAYMENT_SERVICE_URL
+        self.session = get_session()
+        # In-flight and recent refreshes keyed by the refresh token that was
+        # used; the lock only guards this dict, never the POST itself
+        self._refresh_lock = threading.Lock()
+        self._refresh_flights: Dict[str, Tuple[float, Future]] = {}
         
         # Error message translations (Chinese to English)
         self.error_translations = {
@@ -26,37 +111,50 @@ class APIClient:
             '這個 電子信箱 在 使用者 已經存在。': 'A user with that email already exists.',
         }
         
-        # Pattern-based translations
+        # Pattern-based translations (compiled once)
         self.error_patterns = [
-            (r'"(.+)" 不是有效的選擇。', r'"\1" is not a valid choice.'),
+            (re.compile(r'"(.+)" 不是有效的選擇。'), r'"\1" is not a valid choice.'),
         ]
 
     def translate_error(self, error_msg: str) -> str:
         """Translate Chinese error messages to English"""
-        import re
-        
         # First try direct translation
-        if error_msg in self.error_translations:
-            return self.error_translations[error_msg]
-        
+        translated = self.error_translations.get(error_msg)
+        if translated is not None:
+            return translated
+
         # Then try pattern-based translation
         for pattern, replacement in self.error_patterns:
-            if re.search(pattern, error_msg):
-                return re.sub(pattern, replacement, error_msg)
-        
+            translated, count = pattern.subn(replacement, error_msg)
+            if count:
+                return translated
+
         return error_msg
 
     def get_headers(self, include_auth: bool = True) -> Dict[str, str]:
-        """Get request headers with authentication token"""
-        headers = {
-            'Content-Type': 'application/json',
-        }
+        """Get request headers with authentication token (requests sets Content-Type for json= bodies)"""
+        headers = {}
 
         if include_auth and SESSION_ACCESS_TOKEN in st.session_state:
             headers['Authorization'] = f"Bearer {st.session_state[SESSION_ACCESS_TOKEN]}"
 
         return headers
 
+    def _format_field_errors(self, field: str, errors: Any) -> List[str]:
+        """Format one field's validation errors, building the field title once"""
+        if isinstance(errors, str):
+            errors = [errors]
+        elif not isinstance(errors, list):
+            return []
+        title = field.replace('_', ' ').title()
+        messages = []
+        for error in errors:
+            if isinstance(error, dict):
+                error = error.get('string')
+            if isinstance(error, str):
+                messages.append(f"**{title}**: {self.translate_error(error)}")
+        return messages
+
     def handle_response(self, response: requests.Response) -> Optional[Dict[str, Any]]:
         """Handle API response"""
         if response.status_code == 401:
@@ -69,24 +167,21 @@ class APIClient:
                 return None
 
         if response.status_code >= 400:
+            if 'json' not in response.headers.get('Content-Type', ''):
+                # Proxy/server error pages (HTML): nothing to extract, skip
+                # decoding the body at all
+                st.error(f"Error: {response.status_code}")
+                return None
             try:
-                error_data = response.json()
+                error_data = orjson.loads(response.content)
                 
                 # Handle validation errors (field-specific errors)
                 if isinstance(error_data, dict):
-                    error_messages = []
-                    for field, errors in error_data.items():
-                        if isinstance(errors, list):
-                            for error in errors:
-                                if isinstance(error, dict) and 'string' in error:
-                                    translated = self.translate_error(error['string'])
-                                    error_messages.append(f"**{field.replace('_', ' ').title()}**: {translated}")
-                                elif isinstance(error, str):
-                                    translated = self.translate_error(error)
-                                    error_messages.append(f"**{field.replace('_', ' ').title()}**: {translated}")
-                        elif isinstance(errors, str):
-                            translated = self.translate_error(errors)
-                            error_messages.append(f"**{field.replace('_', ' ').title()}**: {translated}")
+                    error_messages = [
+                        message
+                        for field, errors in error_data.items()
+                        for message in self._format_field_errors(field, errors)
+                    ]
                     
                     if error_messages:
                         st.error("❌ Validation errors:\n\n" + "\n\n".join(error_messages))
@@ -100,23 +195,73 @@ class APIClient:
                 st.error(f"Error: {response.status_code}")
             return None
 
-        return response.json()
+        return orjson.loads(response.content)
+
+    def cached_get(self, url: str, include_auth: bool = True) -> Optional[Any]:
+        """GET through the Streamlit data cache so reruns do not refetch"""
+        try:
+            if include_auth:
+                return _fetch_private(
+                    url,
+                    st.session_state.get(SESSION_ACCESS_TOKEN),
+                    st.session_state.get(SESSION_CACHE_GENERATION, 0)
+                )
+            return _fetch_public(url)
+        except requests.HTTPError as e:
+            return self.handle_response(e.response)
+
+    def invalidate(self):
+        """Drop this session's cached data after a write; other users keep theirs"""
+        st.session_state[SESSION_CACHE_GENERATION] = st.session_state.get(SESSION_CACHE_GENERATION, 0) + 1
+
+    def iter_pages(self, url: str, page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield list results page by page, fetching the next cursor page only when it is reached"""
+        url = f"{url}?page_size={page_size}" if page_size else url
+        while url:
+            data = self.cached_get(url)
+            if not data:
+                return
+            yield from data.get('results', [])
+            url = data.get('next')
 
     def refresh_token(self) -> bool:
         """Refresh access token"""
         if SESSION_REFRESH_TOKEN not in st.session_state:
             return False
 
+        refresh = st.session_state[SESSION_REFRESH_TOKEN]
         try:
-            response = requests.post(
-                API_AUTH_REFRESH,
-                json={'refresh': st.session_state[SESSION_REFRESH_TOKEN]}
-            )
+            # Single-flight per refresh token: parallel calls that hit the same
+            # expired token share one POST (the backend rotates and blacklists
+            # refresh tokens, so a second POST with the old one would fail).
+            # Other users' refreshes never wait on this one.
+            with self._refresh_lock:
+                now = time.monotonic()
+                self._refresh_flights = {
+                    token: flight for token, flight in self._refresh_flights.items()
+                    if not flight[1].done() or now - flight[0] < REFRESH_REUSE_WINDOW
+                }
+                flight = self._refresh_flights.get(refresh)
+                owner = flight is None
+                if owner:
+                    flight = self._refresh_flights[refresh] = (now, Future())
+
+            future = flight[1]
+            if owner:
+                try:
+                    response = self.session.post(API_AUTH_REFRESH, json={'refresh': refresh})
+                    future.set_result(orjson.loads(response.content) if response.status_code == 200 else None)
+                except Exception:
+                    future.set_result(None)
+
+            data = future.result()
+            if not data:
+                return False
 
-            if response.status_code == 200:
-                data = response.json()
-                st.session_state[SESSION_ACCESS_TOKEN] = data['access']
-                return True
+            st.session_state[SESSION_ACCESS_TOKEN] = data['access']
+            if 'refresh' in data:
+                st.session_state[SESSION_REFRESH_TOKEN] = data['refresh']
+            return True
         except:
             pass
 
@@ -125,7 +270,7 @@ class APIClient:
     def register(self, username: str, email: str, password: str, **kwargs) -> Optional[Dict[str, Any]]:
         """Register a new user"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 API_AUTH_REGISTER,
                 json={
                     'username': username,
@@ -143,13 +288,13 @@ class APIClient:
     def login(self, email: str, password: str) -> Optional[Dict[str, Any]]:
         """Login user"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 API_AUTH_LOGIN,
                 json={'email': email, 'password': password}
             )
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
 
                 # Save to session state
                 st.session_state[SESSION_USER] = data['user']
@@ -167,18 +312,22 @@ class APIClient:
     def logout(self) -> bool:
         """Logout user"""
         try:
-            requests.post(API_AUTH_LOGOUT, headers=self.get_headers())
-            st.session_state.clear()
+            self.session.post(
+                API_AUTH_LOGOUT,
+                json={'refresh': st.session_state.get(SESSION_REFRESH_TOKEN)},
+                headers=self.get_headers()
+            )
             return True
         except:
-            st.session_state.clear()
             return False
+        finally:
+            self.invalidate()
+            st.session_state.clear()
 
     def get_current_user(self) -> Optional[Dict[str, Any]]:
         """Get current user details"""
         try:
-            response = requests.get(API_USERS_ME, headers=self.get_headers())
-            return self.handle_response(response)
+            return self.cached_get(API_USERS_ME)
         except Exception as e:
             st.error(f"Failed to get user: {str(e)}")
             return None
@@ -186,31 +335,42 @@ class APIClient:
     def get_plans(self) -> Optional[list]:
         """Get all available plans"""
         try:
-            response = requests.get(API_PLANS, headers=self.get_headers(include_auth=False))
-            data = self.handle_response(response)
+            data = self.cached_get(API_PLANS, include_auth=False)
             return data.get('results', []) if data else []
         except Exception as e:
             st.error(f"Failed to get plans: {str(e)}")
             return []
 
+    def iter_subscriptions(self, page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Iterate over all user subscriptions (newest first)"""
+        return self.iter_pages(API_SUBSCRIPTIONS, page_size)
+
     def get_subscriptions(self) -> Optional[list]:
         """Get user subscriptions"""
         try:
-            response = requests.get(API_SUBSCRIPTIONS, headers=self.get_headers())
-            data = self.handle_response(response)
+            data = self.cached_get(API_SUBSCRIPTIONS)
             return data.get('results', []) if data else []
         except Exception as e:
             st.error(f"Failed to get subscriptions: {str(e)}")
             return []
 
+    def get_subscription_stats(self) -> Dict[str, Any]:
+        """Get subscription counts"""
+        try:
+            return self.cached_get(API_SUBSCRIPTIONS_STATS) or {}
+        except Exception as e:
+            st.error(f"Failed to get subscription stats: {str(e)}")
+            return {}
+
     def create_subscription(self, plan_id: str, auto_renew: bool = True) -> Optional[Dict[str, Any]]:
         """Create a new subscription"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 API_SUBSCRIPTIONS,
                 json={'plan_id': plan_id, 'auto_renew': auto_renew},
                 headers=self.get_headers()
             )
+            self.invalidate()
             return self.handle_response(response)
         except Exception as e:
             st.error(f"Failed to create subscription: {str(e)}")
@@ -219,30 +379,43 @@ class APIClient:
     def update_subscription_status(self, subscription_id: str, status: str) -> Optional[Dict[str, Any]]:
         """Update subscription status"""
         try:
-            response = requests.patch(
-                f"{API_SUBSCRIPTIONS}{subscription_id}/update_status/",
+            response = self.session.patch(
+                API_SUBSCRIPTION_STATUS.format(id=subscription_id),
                 json={'status': status},
                 headers=self.get_headers()
             )
+            self.invalidate()
             return self.handle_response(response)
         except Exception as e:
             st.error(f"Failed to update subscription: {str(e)}")
             return None
 
-    def get_orders(self) -> Optional[list]:
-        """Get user orders"""
+    def iter_orders(self, page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Iterate over all user orders (newest first)"""
+        return self.iter_pages(API_ORDERS, page_size)
+
+    def get_orders(self, limit: Optional[int] = None) -> Optional[list]:
+        """Get user orders (newest first; only the first `limit` if given)"""
         try:
-            response = requests.get(API_ORDERS, headers=self.get_headers())
-            data = self.handle_response(response)
+            url = f"{API_ORDERS}?page_size={limit}" if limit else API_ORDERS
+            data = self.cached_get(url)
             return data.get('results', []) if data else []
         except Exception as e:
             st.error(f"Failed to get orders: {str(e)}")
             return []
 
+    def get_order_stats(self) -> Dict[str, Any]:
+        """Get order counts and total spent"""
+        try:
+            return self.cached_get(API_ORDERS_STATS) or {}
+        except Exception as e:
+            st.error(f"Failed to get order stats: {str(e)}")
+            return {}
+
     def create_order(self, plan_id: str, payment_method: str, notes: str = "") -> Optional[Dict[str, Any]]:
         """Create a new order"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 API_ORDERS,
                 json={
                     'plan_id': plan_id,
@@ -251,6 +424,7 @@ class APIClient:
                 },
                 headers=self.get_headers()
             )
+            self.invalidate()
             return self.handle_response(response)
         except Exception as e:
             st.error(f"Failed to create order: {str(e)}")
@@ -259,10 +433,11 @@ class APIClient:
     def cancel_order(self, order_id: str) -> Optional[Dict[str, Any]]:
         """Cancel an order"""
         try:
-            response = requests.patch(
-                f"{API_ORDERS}{order_id}/cancel/",
+            response = self.session.patch(
+                API_ORDER_CANCEL.format(id=order_id),
                 headers=self.get_headers()
             )
+            self.invalidate()
             return self.handle_response(response)
         except Exception as e:
             st.error(f"Failed to cancel order: {str(e)}")
@@ -271,10 +446,11 @@ class APIClient:
     def delete_order(self, order_id: str) -> bool:
         """Delete a cancelled order"""
         try:
-            response = requests.delete(
-                f"{API_ORDERS}{order_id}/",
+            response = self.session.delete(
+                API_ORDER_DETAIL.format(id=order_id),
                 headers=self.get_headers()
             )
+            self.invalidate()
             if response.status_code == 204:
                 return True
             return self.handle_response(response) is not None
@@ -285,16 +461,9 @@ class APIClient:
     def create_payment(self, order_id: str, order_number: str, amount: int, item_name: str, payment_method: str) -> Optional[Dict[str, Any]]:
         """Create payment with ECPay"""
         try:
-            # Map payment methods to ECPay format
-            payment_method_map = {
-                'credit_card': 'Credit',
-                'atm': 'ATM',
-                'cvs': 'CVS',
-                'barcode': 'BARCODE'
-            }
-            ecpay_payment_method = payment_method_map.get(payment_method, 'Credit')
-
-            response = requests.post(
+            ecpay_payment_method = ECPAY_PAYMENT_METHODS.get(payment_method, 'Credit')
+
+            response = self.session.post(
                 API_PAYMENT_CREATE,
                 json={
                     'order_id': order_id,
@@ -310,11 +479,14 @@ class APIClient:
             st.error(f"Failed to create payment: {str(e)}")
             return None
 
+    def iter_invoices(self, page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Iterate over all user invoices (newest first)"""
+        return self.iter_pages(API_INVOICES, page_size)
+
     def get_invoices(self) -> Optional[list]:
         """Get user invoices"""
         try:
-            response = requests.get(API_INVOICES, headers=self.get_headers())
-            data = self.handle_response(response)
+            data = self.cached_get(API_INVOICES)
             return data.get('results', []) if data else []
         except Exception as e:
             st.error(f"Failed to get invoices: {str(e)}")
@@ -323,12 +495,13 @@ class APIClient:
     def delete_account(self, password: str) -> bool:
         """Delete user account"""
         try:
-            response = requests.delete(
-                f"{API_USERS_ME.replace('/me/', '/delete_account/')}",
+            response = self.session.delete(
+                API_USERS_DELETE_ACCOUNT,
                 json={'password': password},
                 headers=self.get_headers()
             )
             if response.status_code == 200:
+                self.invalidate()
                 return True
             else:
                 self.handle_response(response)
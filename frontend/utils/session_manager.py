@@ -4,7 +4,7 @@ Handles authentication token persistence across browser sessions and redirects
 """
 import streamlit as st
 import extra_streamlit_components as stx
-import json
+import orjson
 from typing import Optional, Dict, Any
 from config import SESSION_USER, SESSION_ACCESS_TOKEN, SESSION_REFRESH_TOKEN
 
@@ -18,6 +18,8 @@ class SessionManager:
         if '_cookie_manager' not in st.session_state:
             st.session_state._cookie_manager = stx.CookieManager(key='session_cookie_manager')
         self.cookie_manager = st.session_state._cookie_manager
+        # Cookies read from the browser; get_all() is a component round-trip
+        self._cached_cookies: Optional[Dict[str, str]] = None
 
         # Flag to track if we've already restored in this render
         if '_session_restored' not in st.session_state:
@@ -37,10 +39,12 @@ class SessionManager:
         st.session_state[SESSION_ACCESS_TOKEN] = access_token
         st.session_state[SESSION_REFRESH_TOKEN] = refresh_token
 
-        # Save to cookies (persistent)
-        self.cookie_manager.set('user', json.dumps(user_data), max_age=7*24*60*60)  # 7 days
-        self.cookie_manager.set('access_token', access_token, max_age=24*60*60)  # 1 day
-        self.cookie_manager.set('refresh_token', refresh_token, max_age=7*24*60*60)  # 7 days
+        # Save to a single cookie (persistent), so the browser gets one component message
+        payload = orjson.dumps(
+            {'user': user_data, 'access': access_token, 'refresh': refresh_token}
+        ).decode()
+        self.cookie_manager.set('session', payload, max_age=7*24*60*60)  # 7 days
+        self._cached_cookies = None
 
     def restore_session(self) -> bool:
         """
@@ -63,16 +67,22 @@ class SessionManager:
         # Try to restore from cookies
         try:
             # Wait for cookie manager to be ready
-            all_cookies = self.cookie_manager.get_all()
+            if self._cached_cookies is None:
+                self._cached_cookies = self.cookie_manager.get_all() or {}
+            all_cookies = self._cached_cookies
 
-            if all_cookies:
-                user_cookie = all_cookies.get('user')
-                access_token = all_cookies.get('access_token')
-                refresh_token = all_cookies.get('refresh_token')
+            session_cookie = all_cookies.get('session')
 
-                if user_cookie and access_token:
+            if session_cookie:
+                # The cookie component may already have decoded the JSON
+                session_data = orjson.loads(session_cookie) if isinstance(session_cookie, str) else session_cookie
+                user_data = session_data.get('user')
+                access_token = session_data.get('access')
+                refresh_token = session_data.get('refresh')
+
+                if user_data and access_token:
                     # Restore session state from cookies
-                    st.session_state[SESSION_USER] = json.loads(user_cookie)
+                    st.session_state[SESSION_USER] = user_data
                     st.session_state[SESSION_ACCESS_TOKEN] = access_token
                     if refresh_token:
                         st.session_state[SESSION_REFRESH_TOKEN] = refresh_token
@@ -86,21 +96,16 @@ class SessionManager:
     def clear_session(self):
         """Clear session from both session state and cookies"""
         # Clear session state
-        if SESSION_USER in st.session_state:
-            del st.session_state[SESSION_USER]
-        if SESSION_ACCESS_TOKEN in st.session_state:
-            del st.session_state[SESSION_ACCESS_TOKEN]
-        if SESSION_REFRESH_TOKEN in st.session_state:
-            del st.session_state[SESSION_REFRESH_TOKEN]
+        for key in (SESSION_USER, SESSION_ACCESS_TOKEN, SESSION_REFRESH_TOKEN):
+            st.session_state.pop(key, None)
 
         # Reset restoration flag
         st.session_state._session_restored = False
+        self._cached_cookies = None
 
         # Clear cookies
         try:
-            self.cookie_manager.delete('user')
-            self.cookie_manager.delete('access_token')
-            self.cookie_manager.delete('refresh_token')
+            self.cookie_manager.delete('session')
         except:
             pass
 
@@ -111,11 +116,12 @@ class SessionManager:
         Returns:
             True if authenticated, False otherwise
         """
-        # First try to restore from cookies if needed
-        self.restore_session()
+        # Session state first, so authenticated renders never touch cookies
+        if SESSION_USER in st.session_state and SESSION_ACCESS_TOKEN in st.session_state:
+            return True
 
-        # Then check session state
-        return SESSION_USER in st.session_state and SESSION_ACCESS_TOKEN in st.session_state
+        # Then try to restore from cookies
+        return self.restore_session()
 
 
 # Global session manager instance
@@ -2,9 +2,12 @@
 Celery app for Payment Service
 """
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from config import get_settings
+from typing import Optional
 import httpx
 import logging
+import orjson
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -24,6 +27,31 @@ app.conf.update(
     enable_utc=True,
 )
 
+# One pooled client per worker process, so callbacks to the backend reuse
+# a kept-alive connection instead of opening a new one per task
+_http_client: Optional[httpx.Client] = None
+
+
+def get_http_client() -> httpx.Client:
+    """Return the worker's shared backend client, creating it on first use"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(
+            base_url=settings.backend_url,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=85.0)
+        )
+    return _http_client
+
+
+@worker_process_shutdown.connect
+def close_http_client(**kwargs):
+    """Release the pooled connections when the worker process exits"""
+    global _http_client
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
+
 
 @app.task(bind=True, max_retries=3)
 def process_payment_callback(self, order_number: str, payment_data: dict):
@@ -36,17 +64,16 @@ def process_payment_callback(self, order_number: str, payment_data: dict):
     """
     try:
         # Call Django backend to process payment
-        with httpx.Client() as client:
-            response = client.post(
-                f"{settings.backend_url}/api/orders/process-payment/",
-                json={
-                    "order_number": order_number,
-                    "payment_data": payment_data,
-                    "status": "completed"
-                },
-                timeout=30.0
-            )
-            response.raise_for_status()
+        response = get_http_client().post(
+            "/api/orders/process-payment/",
+            content=orjson.dumps({
+                "order_number": order_number,
+                "payment_data": payment_data,
+                "status": "completed"
+            }),
+            headers={"Content-Type": "application/json"}
+        )
+        response.raise_for_status()
 
         logger.info(f"Payment callback processed for order: {order_number}")
         return {"success": True, "order_number": order_number}
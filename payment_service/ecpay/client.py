@@ -2,12 +2,25 @@
 ECPay Payment Gateway Client
 """
 import hashlib
-from urllib.parse import quote_plus, urlencode
+import hmac
+import re
+import time
+from urllib.parse import parse_qsl, quote_plus, urlencode
 from typing import Dict, Any
 import logging
+import requests
 
 logger = logging.getLogger(__name__)
 
+# Characters ECPay expects unescaped after URL encoding, keyed by their
+# lowercased percent-encoding
+_UNESCAPE_CHARS = {'2d': '-', '5f': '_', '2e': '.', '21': '!', '2a': '*', '28': '(', '29': ')'}
+_UNESCAPE_RE = re.compile('%(' + '|'.join(_UNESCAPE_CHARS) + ')')
+
+
+def _unescape_char(match: re.Match) -> str:
+    return _UNESCAPE_CHARS[match.group(1)]
+
 
 class ECPayClient:
     """ECPay Payment Gateway Client"""
@@ -17,6 +30,11 @@ class ECPayClient:
         self.hash_key = hash_key
         self.hash_iv = hash_iv
         self.payment_url = payment_url
+        # Constant HashKey/HashIV wrapper around every CheckMacValue parameter string
+        self._hash_prefix = f"HashKey={hash_key}&"
+        self._hash_suffix = f"&HashIV={hash_iv}"
+        # Reused across queries so the connection to ECPay stays open
+        self._session = requests.Session()
 
     def generate_check_mac_value(self, params: Dict[str, Any], encrypt_type: int = 1) -> str:
         """
@@ -27,49 +45,41 @@ class ECPayClient:
             params: Payment parameters
             encrypt_type: 0 = MD5, 1 = SHA256 (default: 1)
         """
-        # Remove CheckMacValue if exists
-        params_copy = {k: v for k, v in params.items() if k != 'CheckMacValue'}
-
-        # Convert all values to strings
-        params_copy = {k: str(v) for k, v in params_copy.items()}
-
-        # Sort parameters by key (case-sensitive alphabetical order)
-        sorted_params = sorted(params_copy.items(), key=lambda x: x[0])
+        # Skip CheckMacValue and sort by key (case-sensitive alphabetical order)
+        sorted_params = sorted(
+            ((k, v) for k, v in params.items() if k != 'CheckMacValue'),
+            key=lambda x: x[0]
+        )
 
         # Create parameter string
-        param_str = '&'.join([f'{key}={value}' for key, value in sorted_params])
+        param_str = '&'.join(f'{key}={value}' for key, value in sorted_params)
 
         # Add HashKey and HashIV
-        raw_str = f"HashKey={self.hash_key}&{param_str}&HashIV={self.hash_iv}"
+        raw_str = self._hash_prefix + param_str + self._hash_suffix
 
-        logger.debug(f"Raw string before encoding: {raw_str}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(f"Raw string before encoding: {raw_str}")
 
         # URL encode
         encoded_str = quote_plus(raw_str)
 
-        logger.debug(f"After URL encode: {encoded_str}")
+        if debug:
+            logger.debug(f"After URL encode: {encoded_str}")
 
         # Convert to lowercase
         encoded_str = encoded_str.lower()
 
-        # Replace special characters back (ECPay specific requirement)
-        encoded_str = encoded_str.replace('%2d', '-')
-        encoded_str = encoded_str.replace('%5f', '_')
-        encoded_str = encoded_str.replace('%2e', '.')
-        encoded_str = encoded_str.replace('%21', '!')
-        encoded_str = encoded_str.replace('%2a', '*')
-        encoded_str = encoded_str.replace('%28', '(')
-        encoded_str = encoded_str.replace('%29', ')')
-
-        logger.debug(f"After special char replacement: {encoded_str}")
-
-        # Generate hash based on encrypt_type
-        if encrypt_type == 1:
-            # SHA256
-            check_mac_value = hashlib.sha256(encoded_str.encode('utf-8')).hexdigest().upper()
-        else:
-            # MD5
-            check_mac_value = hashlib.md5(encoded_str.encode('utf-8')).hexdigest().upper()
+        # Replace special characters back (ECPay specific requirement), in one pass
+        encoded_str = _UNESCAPE_RE.sub(_unescape_char, encoded_str)
+
+        if debug:
+            logger.debug(f"After special char replacement: {encoded_str}")
+
+        # Generate hash based on encrypt_type (1 = SHA256, otherwise MD5); the
+        # encoded string is ASCII, and ECPay expects uppercase hex
+        hash_func = hashlib.sha256 if encrypt_type == 1 else hashlib.md5
+        check_mac_value = hash_func(encoded_str.encode('ascii')).hexdigest().upper()
 
         logger.info(f"Generated CheckMacValue (encrypt_type={encrypt_type}): {check_mac_value}")
 
@@ -144,27 +154,22 @@ class ECPayClient:
         Returns:
             True if verification succeeds, False otherwise
         """
-        if 'CheckMacValue' not in callback_data:
+        received_check_mac = callback_data.get('CheckMacValue')
+        if not received_check_mac:
             logger.error("CheckMacValue not found in callback data")
             return False
 
-        # Extract CheckMacValue from callback
-        received_check_mac = callback_data.pop('CheckMacValue')
-
-        # Generate CheckMacValue from callback data
+        # Generate CheckMacValue from callback data (CheckMacValue itself is skipped)
         calculated_check_mac = self.generate_check_mac_value(callback_data)
 
-        # Compare
-        is_valid = received_check_mac == calculated_check_mac
+        # Compare in constant time
+        is_valid = hmac.compare_digest(str(received_check_mac).encode(), calculated_check_mac.encode())
 
         if is_valid:
             logger.info(f"Payment callback verified for order: {callback_data.get('MerchantTradeNo')}")
         else:
             logger.error(f"Payment callback verification failed for order: {callback_data.get('MerchantTradeNo')}")
 
-        # Restore CheckMacValue
-        callback_data['CheckMacValue'] = received_check_mac
-
         return is_valid
 
     def query_payment(self, merchant_trade_no: str, query_url: str) -> Dict[str, Any]:
@@ -178,8 +183,6 @@ class ECPayClient:
         Returns:
             Dict containing payment status
         """
-        import requests
-
         params = {
             'MerchantID': self.merchant_id,
             'MerchantTradeNo': merchant_trade_no,
@@ -191,14 +194,11 @@ class ECPayClient:
         params['CheckMacValue'] = check_mac_value
 
         try:
-            response = requests.post(query_url, data=params)
+            response = self._session.post(query_url, data=params, timeout=30)
             response.raise_for_status()
 
             # Parse response
-            result = {}
-            for item in response.text.split('&'):
-                key, value = item.split('=')
-                result[key] = value
+            result = dict(parse_qsl(response.text, keep_blank_values=True))
 
             logger.info(f"Queried payment status for order: {merchant_trade_no}")
             return result
@@ -206,5 +206,3 @@ class ECPayClient:
             logger.error(f"Failed to query payment: {str(e)}")
             return {}
 
-
-import time
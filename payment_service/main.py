@@ -1,41 +1,88 @@
 """
 FastAPI Payment Service - Main Application
 """
-from fastapi import FastAPI, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, HTTPException, Request, Response, Form
+from fastapi.responses import HTMLResponse, ORJSONResponse, PlainTextResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from contextlib import asynccontextmanager
 from datetime import datetime
+from string import Template
+from logging.handlers import QueueHandler, QueueListener
+from urllib.parse import quote, urlencode
+import asyncio
+import atexit
+import html
 import httpx
+import json
 import logging
+import orjson
+import os
+import queue
+import redis.asyncio as aioredis
+import time
 from config import get_settings
 from ecpay.client import ECPayClient
+from celery_app import process_payment_callback
 
-# Setup logging
-import os
+# Setup logging; records are formatted by the QueueHandler and written by a
+# background listener thread, so handlers never block on disk I/O
 os.makedirs('logs', exist_ok=True)
 
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(
+    log_queue,
+    logging.FileHandler('logs/payment_service.log'),
+    logging.StreamHandler()
+)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/payment_service.log'),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(log_queue)]
 )
 logger = logging.getLogger(__name__)
 
+# Get settings
+settings = get_settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one pooled backend client and Redis pool across requests, closed on shutdown"""
+    app.state.http = httpx.AsyncClient(
+        base_url=settings.backend_url,
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+    redis_pool = aioredis.ConnectionPool(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=settings.redis_db,
+        password=settings.redis_password if settings.redis_password else None,
+        decode_responses=True,
+        max_connections=64
+    )
+    app.state.redis = aioredis.Redis(connection_pool=redis_pool)
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+        await redis_pool.disconnect()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Payment Service API",
     description="FastAPI Payment Microservice with ECPay Integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# Get settings
-settings = get_settings()
-
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -54,6 +101,73 @@ ecpay_client = ECPayClient(
 )
 
 
+# OrderResultURL must be publicly accessible for ECPay to redirect
+PAYMENT_SERVICE_PUBLIC_URL = "http://localhost:8001"  # Public URL for ECPay
+ORDER_RESULT_URL = f"{PAYMENT_SERVICE_PUBLIC_URL}/payment/ecpay/result/"
+FRONTEND_REDIRECT_PREFIX = f"{settings.frontend_url}?"
+
+# Spinner page for /payment/ecpay/result/; only the redirect URL varies
+RESULT_PAGE_TEMPLATE = Template("""\
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Payment Complete</title>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            display: flex;
+            justify-content: center;
+            align-items: center;
+            height: 100vh;
+            margin: 0;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            color: white;
+        }
+        .container {
+            text-align: center;
+            padding: 40px;
+            background: rgba(255, 255, 255, 0.1);
+            border-radius: 10px;
+            backdrop-filter: blur(10px);
+        }
+        .spinner {
+            border: 4px solid rgba(255, 255, 255, 0.3);
+            border-top: 4px solid white;
+            border-radius: 50%;
+            width: 50px;
+            height: 50px;
+            animation: spin 1s linear infinite;
+            margin: 20px auto;
+        }
+        @keyframes spin {
+            0% { transform: rotate(0deg); }
+            100% { transform: rotate(360deg); }
+        }
+        a {
+            color: white;
+            text-decoration: underline;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h2>✅ Payment Processed</h2>
+        <div class="spinner"></div>
+        <p>Redirecting to results page...</p>
+        <p><small>If you are not redirected automatically, <a href="$href">click here</a>.</small></p>
+    </div>
+    <script>
+        // Redirect after 1 second
+        setTimeout(function() {
+            window.location.href = $js_url;
+        }, 1000);
+    </script>
+</body>
+</html>
+""")
+
+
 # Pydantic models
 class PaymentCreateRequest(BaseModel):
     """Request model for creating payment"""
@@ -73,14 +187,50 @@ class PaymentResponse(BaseModel):
     message: Optional[str] = None
 
 
+class TTLCache:
+    """Small in-process cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[str, Tuple[float, Any]] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry[0]:
+            del self._data[key]
+            return None
+        return entry[1]
+
+    def set(self, key: str, value: Any):
+        if len(self._data) >= self.maxsize:
+            # Dicts keep insertion order, so this drops the oldest entry
+            self._data.pop(next(iter(self._data)))
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+
+# Issued invoices do not change; order status does, so orders expire quickly
+invoice_cache = TTLCache(ttl=60)
+order_cache = TTLCache(ttl=5)
+
+
 # Helper functions
 async def get_order_from_backend(order_id: str) -> Dict[str, Any]:
     """Fetch order details from Django backend"""
+    order = order_cache.get(order_id)
+    if order is not None:
+        return order
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{settings.backend_url}/api/orders/{order_id}/")
-            response.raise_for_status()
-            return response.json()
+        response = await app.state.http.get(f"/api/orders/{order_id}/")
+        response.raise_for_status()
+        order = response.json()
+        order_cache.set(order_id, order)
+        return order
     except Exception as e:
         logger.error(f"Failed to fetch order from backend: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch order details")
@@ -89,36 +239,42 @@ async def get_order_from_backend(order_id: str) -> Dict[str, Any]:
 async def update_order_status(order_id: str, status: str, payment_data: Dict[str, Any]) -> bool:
     """Update order status in Django backend"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(
-                f"{settings.backend_url}/api/orders/{order_id}/",
-                json={
-                    "status": status,
-                    "payment_data": payment_data
-                }
-            )
-            response.raise_for_status()
-            return True
+        response = await app.state.http.patch(
+            f"/api/orders/{order_id}/",
+            json={
+                "status": status,
+                "payment_data": payment_data
+            }
+        )
+        response.raise_for_status()
+        order_cache.delete(order_id)
+        return True
     except Exception as e:
         logger.error(f"Failed to update order status: {str(e)}")
         return False
 
 
 # API endpoints
+# Static bodies, encoded once. A fresh Response is still built per request
+# because middleware (e.g. CORS) appends to the response's header list.
+ROOT_BODY = orjson.dumps({
+    "service": "Payment Service",
+    "version": "1.0.0",
+    "status": "running"
+})
+HEALTH_BODY = orjson.dumps({"status": "healthy"})
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
-    return {
-        "service": "Payment Service",
-        "version": "1.0.0",
-        "status": "running"
-    }
+    return Response(content=ROOT_BODY, media_type="application/json")
 
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return Response(content=HEALTH_BODY, media_type="application/json")
 
 
 @app.post("/payment/ecpay/create/", response_model=PaymentResponse)
@@ -132,8 +288,8 @@ async def create_ecpay_payment(payment_request: PaymentCreateRequest):
     try:
         # Generate unique merchant trade number for retry payments
         # ECPay doesn't allow duplicate MerchantTradeNo, so we append timestamp
-        from datetime import datetime as dt
-        timestamp_suffix = dt.now().strftime('%H%M%S')  # HHMMSS format
+        now = datetime.now()
+        timestamp_suffix = now.strftime('%H%M%S')  # HHMMSS format
 
         # If order_number is already max length (20 chars), use it as base
         # Otherwise append timestamp to make it unique for retries
@@ -146,20 +302,12 @@ async def create_ecpay_payment(payment_request: PaymentCreateRequest):
         # Ensure it doesn't exceed 20 chars
         merchant_trade_no = merchant_trade_no[:20]
 
-        merchant_trade_date = datetime.now().strftime('%Y/%m/%d %H:%M:%S')
+        merchant_trade_date = now.strftime('%Y/%m/%d %H:%M:%S')
 
         logger.info(f"Original order number: {payment_request.order_number}, Merchant trade no: {merchant_trade_no}")
 
         # Store mapping in Redis for callback processing (expires in 24 hours)
-        import redis
-        redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            db=settings.redis_db,
-            password=settings.redis_password if settings.redis_password else None,
-            decode_responses=True
-        )
-        redis_client.setex(
+        await app.state.redis.setex(
             f"payment:merchant_trade_no:{merchant_trade_no}",
             86400,  # 24 hours
             payment_request.order_number
@@ -167,9 +315,6 @@ async def create_ecpay_payment(payment_request: PaymentCreateRequest):
         logger.info(f"Stored mapping: {merchant_trade_no} -> {payment_request.order_number}")
 
         # Create payment
-        # OrderResultURL must be publicly accessible for ECPay to redirect
-        payment_service_public_url = "http://localhost:8001"  # Public URL for ECPay
-
         payment_data = ecpay_client.create_payment(
             merchant_trade_no=merchant_trade_no,
             merchant_trade_date=merchant_trade_date,
@@ -177,7 +322,7 @@ async def create_ecpay_payment(payment_request: PaymentCreateRequest):
             trade_desc=payment_request.description,
             item_name=payment_request.item_name,
             return_url=settings.ecpay_callback_url,  # Backend callback for order update
-            order_result_url=f"{payment_service_public_url}/payment/ecpay/result/",  # POST to GET converter
+            order_result_url=ORDER_RESULT_URL,  # POST to GET converter
             client_back_url=settings.frontend_url,  # User return button
             choose_payment=payment_request.payment_method
         )
@@ -198,7 +343,7 @@ async def create_ecpay_payment(payment_request: PaymentCreateRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/payment/ecpay/result/")
+@app.post("/payment/ecpay/result/", response_class=HTMLResponse)
 async def ecpay_payment_result(request: Request):
     """
     ECPay payment result endpoint (OrderResultURL)
@@ -229,79 +374,22 @@ async def ecpay_payment_result(request: Request):
         }
 
         # Create query string
-        from urllib.parse import urlencode
-        query_string = urlencode(redirect_params)
-        redirect_url = f"{settings.frontend_url}?{query_string}"
+        redirect_url = FRONTEND_REDIRECT_PREFIX + urlencode(redirect_params, quote_via=quote)
 
         logger.info(f"Redirecting to: {redirect_url}")
 
         # Return HTML with auto-redirect using JavaScript (more reliable than meta refresh)
-        return HTMLResponse(content=f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Payment Complete</title>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    display: flex;
-                    justify-content: center;
-                    align-items: center;
-                    height: 100vh;
-                    margin: 0;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                }}
-                .container {{
-                    text-align: center;
-                    padding: 40px;
-                    background: rgba(255, 255, 255, 0.1);
-                    border-radius: 10px;
-                    backdrop-filter: blur(10px);
-                }}
-                .spinner {{
-                    border: 4px solid rgba(255, 255, 255, 0.3);
-                    border-top: 4px solid white;
-                    border-radius: 50%;
-                    width: 50px;
-                    height: 50px;
-                    animation: spin 1s linear infinite;
-                    margin: 20px auto;
-                }}
-                @keyframes spin {{
-                    0% {{ transform: rotate(0deg); }}
-                    100% {{ transform: rotate(360deg); }}
-                }}
-                a {{
-                    color: white;
-                    text-decoration: underline;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>✅ Payment Processed</h2>
-                <div class="spinner"></div>
-                <p>Redirecting to results page...</p>
-                <p><small>If you are not redirected automatically, <a href="{redirect_url}">click here</a>.</small></p>
-            </div>
-            <script>
-                // Redirect after 1 second
-                setTimeout(function() {{
-                    window.location.href = "{redirect_url}";
-                }}, 1000);
-            </script>
-        </body>
-        </html>
-        """)
+        return HTMLResponse(content=RESULT_PAGE_TEMPLATE.substitute(
+            href=html.escape(redirect_url),
+            js_url=json.dumps(redirect_url)
+        ))
 
     except Exception as e:
         logger.error(f"Failed to process payment result: {str(e)}")
-        return f"<html><body><h1>Error</h1><p>{str(e)}</p></body></html>"
+        return f"<html><body><h1>Error</h1><p>{html.escape(str(e))}</p></body></html>"
 
 
-@app.post("/payment/ecpay/callback/")
+@app.post("/payment/ecpay/callback/", response_class=PlainTextResponse)
 async def ecpay_payment_callback(request: Request):
     """
     ECPay payment callback endpoint
@@ -310,32 +398,23 @@ async def ecpay_payment_callback(request: Request):
     and updates the order status accordingly.
     """
     try:
-        # Get form data
+        # Get form data; the one dict is used for verification and the task
         form_data = await request.form()
         callback_data = dict(form_data)
 
         logger.info(f"Received payment callback: {callback_data}")
 
         # Verify callback
-        if not ecpay_client.verify_callback(callback_data.copy()):
+        if not ecpay_client.verify_callback(callback_data):
             logger.error("Payment callback verification failed")
             return "0|Verification failed"
 
         # Extract payment information
         merchant_trade_no = callback_data.get('MerchantTradeNo')
         rtn_code = callback_data.get('RtnCode')
-        payment_type = callback_data.get('PaymentType')
 
         # Get original order number from Redis
-        import redis
-        redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            db=settings.redis_db,
-            password=settings.redis_password if settings.redis_password else None,
-            decode_responses=True
-        )
-        original_order_number = redis_client.get(f"payment:merchant_trade_no:{merchant_trade_no}")
+        original_order_number = await app.state.redis.get(f"payment:merchant_trade_no:{merchant_trade_no}")
 
         if not original_order_number:
             # Fallback: try to use merchant_trade_no directly (for old orders)
@@ -348,8 +427,9 @@ async def ecpay_payment_callback(request: Request):
         if rtn_code == '1':
             # Update order status via Celery task
             # This will be processed asynchronously
-            from celery_app import process_payment_callback
-            process_payment_callback.delay(original_order_number, callback_data)
+            # delay() publishes to the broker over a blocking socket, so keep it
+            # off the event loop
+            await asyncio.to_thread(process_payment_callback.delay, original_order_number, callback_data)
 
             logger.info(f"Payment successful for order: {merchant_trade_no}")
             return "1|OK"
@@ -373,22 +453,34 @@ async def ecpay_payment_return(request: Request):
 
 
 @app.get("/payment/invoice/{order_id}/")
-async def get_invoice(order_id: str):
+async def get_invoice(order_id: str, response: Response):
     """
     Get invoice for an order
 
     This endpoint retrieves the invoice details for a completed order.
     """
+    # Payment state must not be served stale by intermediary caches
+    response.headers["Cache-Control"] = "no-store"
+
+    invoice = invoice_cache.get(order_id)
+    if invoice is not None:
+        return invoice
+
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{settings.backend_url}/api/invoices/?order={order_id}")
-            response.raise_for_status()
-            invoices = response.json()
-
-            if invoices and len(invoices['results']) > 0:
-                return invoices['results'][0]
-            else:
-                raise HTTPException(status_code=404, detail="Invoice not found")
+        # An order has at most one invoice, so a one-item page is enough
+        backend_response = await app.state.http.get(
+            "/api/invoices/", params={"order__external_id": order_id, "page_size": 1}
+        )
+        backend_response.raise_for_status()
+        results = orjson.loads(backend_response.content).get('results')
+
+        # Never return (or cache) an invoice for some other order
+        if results and results[0]['order']['id'] == order_id:
+            invoice = results[0]
+            invoice_cache.set(order_id, invoice)
+            return invoice
+        else:
+            raise HTTPException(status_code=404, detail="Invoice not found")
 
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail="Invoice not found")